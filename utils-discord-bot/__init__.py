@@ -0,0 +1,89 @@
+import importlib
+from typing import TYPE_CHECKING, Any
+
+# public names and the submodule defining each; a submodule, and with it discord or
+# lark, is only imported when one of its names is first used
+_EXPORTS: dict[str, str] = {
+    "AttachmentStore": "attachments",
+    "StoredAttachment": "attachments",
+    "Autocomplete": "autocomplete",
+    "Command": "cog",
+    "GroupCog": "cog",
+    "CommandParser": "commandparser",
+    "CommandParserError": "commandparser",
+    "grammar_registry": "commandparser",
+    "Dispatcher": "dispatcher",
+    "Metrics": "metrics",
+    "OutboundScheduler": "outbound",
+    "Priority": "outbound",
+    "PersistentPages": "persistent",
+    "persistent_pages": "persistent",
+    "Profiler": "profiling",
+    "ReactionPipeline": "reactions",
+    "reaction_pipeline": "reactions",
+    "RunnerRegistry": "registry",
+    "IRunner": "runner",
+    "Runner": "runner",
+    "ExpiryScheduler": "scheduler",
+    "MemorySessionStore": "sessions",
+    "SessionStore": "sessions",
+    "SQLiteSessionStore": "sessions",
+    "TeardownService": "teardown",
+    "teardown_service": "teardown",
+    "Trie": "trie",
+    "UnSet": "window",
+    "Window": "window",
+    "CallablePageSource": "windows",
+    "IteratorPageSource": "windows",
+    "ListPageSource": "windows",
+    "PageSource": "windows",
+    "Pages": "windows",
+    "TextPageSource": "windows",
+    "Windows": "windows",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(
+            "module {0!r} has no attribute {1!r}".format(__name__, name)
+        )
+    value = getattr(importlib.import_module("." + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return list(__all__)
+
+
+if TYPE_CHECKING:
+    from .attachments import AttachmentStore, StoredAttachment
+    from .autocomplete import Autocomplete
+    from .cog import Command, GroupCog
+    from .commandparser import CommandParser, CommandParserError, grammar_registry
+    from .dispatcher import Dispatcher
+    from .metrics import Metrics
+    from .outbound import OutboundScheduler, Priority
+    from .persistent import PersistentPages, persistent_pages
+    from .profiling import Profiler
+    from .reactions import ReactionPipeline, reaction_pipeline
+    from .registry import RunnerRegistry
+    from .runner import IRunner, Runner
+    from .scheduler import ExpiryScheduler
+    from .sessions import MemorySessionStore, SessionStore, SQLiteSessionStore
+    from .teardown import TeardownService, teardown_service
+    from .trie import Trie
+    from .window import UnSet, Window
+    from .windows import (
+        CallablePageSource,
+        IteratorPageSource,
+        ListPageSource,
+        PageSource,
+        Pages,
+        TextPageSource,
+        Windows,
+    )
@@ -0,0 +1,210 @@
+import io
+import mmap
+import os
+import time
+import weakref
+from typing import Optional, Union
+from urllib.parse import parse_qs, urlparse
+
+import discord
+
+Buffer = Union[bytes, mmap.mmap]
+
+# attachments whose reused URL points into a message, by the id of that message
+_by_message: dict[int, "weakref.WeakSet[StoredAttachment]"] = {}
+
+
+# the URLs into a deleted message are dead; teardown calls this, and so should the
+# bot for messages deleted in other ways
+def forget_message(message_id: int) -> None:
+    for attachment in _by_message.pop(message_id, ()):
+        attachment.forget(message_id)
+
+
+# a read-only file over a shared buffer; each send gets its own position
+class BufferReader(io.RawIOBase):
+    def __init__(self, buffer: Buffer) -> None:
+        super().__init__()
+        self.view = memoryview(buffer)
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), len(self.view) - self.position)
+        if size <= 0:
+            return 0
+        buffer[:size] = self.view[self.position : self.position + size]
+        self.position += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = len(self.view) + offset
+        else:
+            raise ValueError(whence)
+        if position < 0:
+            raise ValueError(position)
+        self.position = position
+        return position
+
+    def tell(self) -> int:
+        return self.position
+
+    def close(self) -> None:
+        self.view.release()
+        super().close()
+
+
+class StoredAttachment:
+    def __init__(
+        self,
+        buffer: Buffer,
+        filename: str,
+        spoiler: bool = False,
+        description: Optional[str] = None,
+        reuse_url: bool = False,
+    ) -> None:
+        self.buffer = buffer
+        self.filename = filename
+        self.spoiler = spoiler
+        self.description = description
+        # send the CDN URL of an earlier upload instead of uploading again, for as
+        # long as the message it was uploaded to exists
+        self.reuse_url = reuse_url
+        self.url: Optional[str] = None
+        self.url_expires: Optional[float] = None
+        self.url_message_id: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def to_file(self) -> discord.File:
+        return discord.File(
+            BufferReader(self.buffer),
+            filename=self.filename,
+            spoiler=self.spoiler,
+            description=self.description,
+        )
+
+    # a URL still in use is kept, so that it stays tied to the oldest live message
+    def remember(self, attachment: discord.Attachment, message_id: int) -> None:
+        if not self.reuse_url or self.reusable_url() is not None:
+            return
+        self.forget(self.url_message_id)
+        self.url = attachment.url
+        self.url_message_id = message_id
+        _by_message.setdefault(message_id, weakref.WeakSet()).add(self)
+        # CDN links are signed and stop working at the hex timestamp in "ex"
+        expires = parse_qs(urlparse(attachment.url).query).get("ex")
+        try:
+            self.url_expires = None if expires is None else int(expires[0], 16)
+        except ValueError:
+            self.url_expires = None
+
+    def forget(self, message_id: Optional[int]) -> None:
+        if message_id is None or self.url_message_id != message_id:
+            return
+        attachments = _by_message.get(message_id)
+        if attachments is not None:
+            attachments.discard(self)
+            if not attachments:
+                del _by_message[message_id]
+        self.url = None
+        self.url_expires = None
+        self.url_message_id = None
+
+    def reusable_url(self, margin: float = 60.0) -> Optional[str]:
+        if not self.reuse_url or self.url is None:
+            return None
+        if self.url_expires is not None and self.url_expires - margin <= time.time():
+            return None
+        return self.url
+
+    def close(self) -> None:
+        if isinstance(self.buffer, mmap.mmap):
+            try:
+                self.buffer.close()
+            except BufferError:
+                # a send still reads from it; the map is freed with the last view
+                pass
+
+
+# file contents shared by every window and send that refers to them
+class AttachmentStore:
+    def __init__(self) -> None:
+        self.attachments: dict[str, StoredAttachment] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.attachments
+
+    def get(self, key: str) -> StoredAttachment:
+        return self.attachments[key]
+
+    def add_bytes(
+        self,
+        key: str,
+        data: bytes,
+        filename: Optional[str] = None,
+        spoiler: bool = False,
+        description: Optional[str] = None,
+        reuse_url: bool = False,
+    ) -> StoredAttachment:
+        return self._add(
+            key,
+            StoredAttachment(
+                bytes(data),
+                filename=key if filename is None else filename,
+                spoiler=spoiler,
+                description=description,
+                reuse_url=reuse_url,
+            ),
+        )
+
+    # maps the file into memory instead of reading it
+    def add_file(
+        self,
+        key: str,
+        path: Union[str, os.PathLike],
+        filename: Optional[str] = None,
+        spoiler: bool = False,
+        description: Optional[str] = None,
+        reuse_url: bool = False,
+    ) -> StoredAttachment:
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                buffer: Buffer = b""
+            else:
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._add(
+            key,
+            StoredAttachment(
+                buffer,
+                filename=os.path.basename(path) if filename is None else filename,
+                spoiler=spoiler,
+                description=description,
+                reuse_url=reuse_url,
+            ),
+        )
+
+    def _add(self, key: str, attachment: StoredAttachment) -> StoredAttachment:
+        self.remove(key)
+        self.attachments[key] = attachment
+        return attachment
+
+    def remove(self, key: str) -> None:
+        attachment = self.attachments.pop(key, None)
+        if attachment is not None:
+            attachment.close()
+
+    def close(self) -> None:
+        for key in list(self.attachments):
+            self.remove(key)
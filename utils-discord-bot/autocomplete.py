@@ -0,0 +1,85 @@
+from typing import Final, Optional
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from .commandparser import CommandParser
+from .trie import Trie
+
+# limits of a slash command option's choices
+MAX_CHOICES: Final[int] = 25
+MAX_CHOICE_LENGTH: Final[int] = 100
+
+
+# completes the last word of a free text option with the flags of a CommandParser
+class Autocomplete:
+    def __init__(self, parser: CommandParser) -> None:
+        self.parser = parser
+        self.spec: Optional[CommandParser.Spec] = None
+        # "--page", "-p" and "page" all lead to the OptArg of --page
+        self.index: Trie[CommandParser.OptArg] = Trie()
+
+    def _refresh(self) -> CommandParser.Spec:
+        spec = (
+            self.parser.spec if self.parser.spec is not None else self.parser.compile()
+        )
+        if spec is self.spec:
+            return spec
+        index: Trie[CommandParser.OptArg] = Trie()
+        for arg in spec.optionals.values():
+            index.insert("--" + arg.name, arg)
+            index.insert(arg.name, arg)
+            if arg.omitted_flag:
+                index.insert("-" + arg.omitted_flag, arg)
+        self.index = index
+        self.spec = spec
+        return spec
+
+    def complete(self, current: str) -> list[str]:
+        spec = self._refresh()
+        if current == "" or current[-1].isspace():
+            head, word = current, ""
+        else:
+            words = current.rsplit(maxsplit=1)
+            word = words[-1]
+            head = current[: len(current) - len(word)]
+        # flags that were already inputted are not suggested again
+        inputted = {
+            spec.long_names[token.lstrip("-").lower()]
+            for token in head.split()
+            if token.startswith("-") and token.lstrip("-").lower() in spec.long_names
+        }
+
+        completions = []
+        seen = set()
+        for key, arg in self.index.items(word):
+            if arg.name in inputted or arg.name in seen:
+                continue
+            seen.add(arg.name)
+            completion = head + (key if key.startswith("-") else "--" + key)
+            if len(completion) <= MAX_CHOICE_LENGTH:
+                completions.append(completion)
+            if len(completions) >= MAX_CHOICES:
+                break
+        return completions
+
+    async def callback(
+        self, interaction: discord.Interaction, current: str
+    ) -> list[app_commands.Choice[str]]:
+        return [
+            app_commands.Choice(name=completion, value=completion)
+            for completion in self.complete(current)
+        ]
+
+    def attach(self, command: app_commands.Command, parameter: str) -> None:
+        command.autocomplete(parameter)(self.callback)
+
+    # attaches to every app command of the cog that has the parameter
+    def attach_cog(self, cog: commands.Cog, parameter: str) -> None:
+        for command in cog.walk_app_commands():
+            if (
+                isinstance(command, app_commands.Command)
+                and command.get_parameter(parameter) is not None
+            ):
+                self.attach(command, parameter)
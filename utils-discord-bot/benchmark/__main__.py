@@ -0,0 +1,103 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os.path
+import platform
+import subprocess
+import sys
+from typing import Any, Callable, Optional
+
+import discord
+import lark
+
+from . import (
+    commandparser,
+    dispatcher,
+    importtime,
+    outbound,
+    pages,
+    scheduler,
+    window,
+)
+
+
+def revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            cwd=os.path.dirname(__file__),
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def suites(args: argparse.Namespace) -> dict[str, Callable[[], Any]]:
+    return {
+        "parse_args": lambda: commandparser.run_parse_args(
+            commandparser.DEFAULT_CORPUS
+        ),
+        "scan": lambda: commandparser.run(commandparser.DEFAULT_CORPUS),
+        "dispatcher": dispatcher.run,
+        "window_memory": window.run,
+        "window_send_edit": lambda: asyncio.run(
+            window.send_edit(
+                latency=args.latency, rate=args.rate, capacity=args.capacity
+            )
+        ),
+        "pages": lambda: asyncio.run(pages.run()),
+        "runner_expiry": lambda: asyncio.run(scheduler.run()),
+        "outbound": lambda: asyncio.run(outbound.simulate()),
+        "outbound_broadcast": lambda: asyncio.run(outbound.broadcast()),
+        "import_time": importtime.run,
+    }
+
+
+# runs every benchmark (or the chosen ones) and writes one JSON document so that
+# results can be compared across versions
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="benchmark")
+    parser.add_argument("names", nargs="*", help="benchmarks to run, default all")
+    parser.add_argument("-o", "--output", help="write the JSON here, default stdout")
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--rate", type=float, default=5.0)
+    parser.add_argument("--capacity", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    available = suites(args)
+    names = args.names or list(available)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        parser.error("unknown benchmarks: {0}".format(", ".join(unknown)))
+
+    results = {}
+    for name in names:
+        print("running {0}".format(name), file=sys.stderr)
+        results[name] = available[name]()
+    document = {
+        "revision": revision(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "discord.py": discord.__version__,
+        "lark": lark.__version__,
+        "transport": {
+            "latency": args.latency,
+            "rate": args.rate,
+            "capacity": args.capacity,
+        },
+        "results": results,
+    }
+    if args.output is None:
+        json.dump(document, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    else:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(document, output, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
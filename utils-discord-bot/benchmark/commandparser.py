@@ -0,0 +1,95 @@
+import sys
+import time
+import timeit
+from functools import reduce
+from typing import Final
+
+from lark.exceptions import LarkError
+
+from ..commandparser import CommandParser, CommandParserError
+
+# command lines as they reach CommandParser.parse_args, one per line
+DEFAULT_CORPUS: Final[list[str]] = [
+    '',
+    'list',
+    'list --page 2',
+    'list -p 2',
+    'search discord bot --limit 10',
+    'search 東京 タワー -l 5',
+    'remind 10m take a break --repeat daily --silent',
+    'poll "lunch?" pizza sushi ramen --anonymous -t 30',
+    'role add Moderator --user alice --user bob',
+    'dice 2d6 -5 -ab',
+    'say hello --channel general -e',
+    'config set prefix ! --Guild 1234567890',
+    'todo add buy milk\tand eggs -P high',
+    'ban --reason spamming links --days 7 -s',
+    'translate こんにちは　世界 --to en',
+]
+
+
+def load_corpus(path: str) -> list[str]:
+    with open(path, encoding='utf-8') as corpus:
+        return [line.rstrip('\n') for line in corpus]
+
+
+def parse_with_lark(parser: CommandParser, args: tuple[str, ...]):
+    tree = parser.parser.parse(reduce(lambda x, y: x + ' ' + y, args, ''))
+    return CommandParser.CommandTransformer().transform(tree)
+
+
+def run(corpus: list[str], number: int = 1000) -> dict[str, float]:
+    parser = CommandParser()
+    inputs = [tuple(line.split(' ')) if line else () for line in corpus]
+
+    fallbacks = 0
+    for args in inputs:
+        scanned = CommandParser._scan(args)
+        if scanned is None:
+            fallbacks += 1
+            continue
+        expected = parse_with_lark(parser, args)
+        if scanned != expected:
+            raise AssertionError('{0!r}: {1!r} != {2!r}'.format(args, scanned, expected))
+
+    scannable = [args for args in inputs if CommandParser._scan(args) is not None]
+    lark_time = timeit.timeit(
+        lambda: [parse_with_lark(parser, args) for args in scannable], number=number
+    )
+    scan_time = timeit.timeit(
+        lambda: [CommandParser._scan(args) for args in scannable], number=number
+    )
+    return {
+        'lines': len(inputs),
+        'fallbacks': fallbacks,
+        'lark_us_per_line': lark_time / number / len(scannable) * 1e6,
+        'scan_us_per_line': scan_time / number / len(scannable) * 1e6,
+        'speedup': lark_time / scan_time,
+    }
+
+
+# end to end through the public API, with and without the result cache; lines the
+# parser rejects are timed as well since rejecting them is part of the work
+def run_parse_args(corpus: list[str], number: int = 200) -> dict[str, float]:
+    inputs = [tuple(line.split(' ')) if line else () for line in corpus]
+    result = {'lines': len(inputs)}
+    for name, cache_size in (('uncached', 0), ('cached', len(inputs))):
+        parser = CommandParser(cache_size=cache_size)
+        parser.add_argument('--page', '-p')
+        parser.add_argument('--limit', '-l')
+        start = time.perf_counter()
+        for _ in range(number):
+            for args in inputs:
+                try:
+                    parser.parse_args(args)
+                except (CommandParserError, LarkError):
+                    pass
+        elapsed = time.perf_counter() - start
+        result['{0}_lines_per_second'.format(name)] = number * len(inputs) / elapsed
+    return result
+
+
+if __name__ == '__main__':
+    result = run(load_corpus(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CORPUS)
+    for key, value in result.items():
+        print('{0}: {1}'.format(key, value))
@@ -0,0 +1,102 @@
+import random
+import string
+import time
+
+from ..commandparser import CommandParser
+from ..dispatcher import Dispatcher
+
+PREFIX = "!"
+
+
+def make_commands(count: int) -> dict[str, CommandParser]:
+    commands = {}
+    rng = random.Random(0)
+    while len(commands) < count:
+        name = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10)))
+        parser = CommandParser()
+        parser.add_argument("target")
+        parser.add_argument("--page", "-p")
+        parser.add_argument("--verbose")
+        commands[name] = parser
+    return commands
+
+
+def make_stream(
+    names: list[str], length: int, command_ratio: float
+) -> list[str]:
+    rng = random.Random(1)
+    chatter = [
+        "hello everyone",
+        "lol",
+        "!!! what happened",
+        "did anyone see the match yesterday?",
+        "!notacommand at all",
+        "おはようございます",
+    ]
+    stream = []
+    for _ in range(length):
+        if rng.random() < command_ratio:
+            stream.append(
+                "{0}{1} item{2} -p {3}".format(
+                    PREFIX, rng.choice(names), rng.randint(0, 99), rng.randint(1, 9)
+                )
+            )
+        else:
+            stream.append(rng.choice(chatter))
+    return stream
+
+
+def naive_route(commands: dict[str, CommandParser], content: str):
+    for name, parser in commands.items():
+        head = PREFIX + name
+        if content == head or content.startswith(head + " "):
+            return parser.parse(tuple(content[len(head) :].split()))
+    return None
+
+
+def trie_route(dispatcher: Dispatcher, content: str):
+    match = dispatcher.match(content)
+    if match is None:
+        return None
+    return match.entry.parser.parse(match.args)
+
+
+def run(
+    command_count: int = 100, length: int = 100_000, command_ratio: float = 0.05
+) -> dict[str, float]:
+    commands = make_commands(command_count)
+    dispatcher = Dispatcher(prefix=PREFIX)
+
+    async def callback(message, namespace) -> None:
+        pass
+
+    for name, parser in commands.items():
+        dispatcher.register(name, parser, callback)
+    stream = make_stream(list(commands), length, command_ratio)
+
+    for content in stream:
+        if naive_route(commands, content) != trie_route(dispatcher, content):
+            raise AssertionError(content)
+
+    start = time.perf_counter()
+    for content in stream:
+        naive_route(commands, content)
+    naive_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for content in stream:
+        trie_route(dispatcher, content)
+    trie_time = time.perf_counter() - start
+
+    return {
+        "commands": command_count,
+        "messages": length,
+        "naive_messages_per_second": length / naive_time,
+        "trie_messages_per_second": length / trie_time,
+        "speedup": naive_time / trie_time,
+    }
+
+
+if __name__ == "__main__":
+    for key, value in run().items():
+        print("{0}: {1}".format(key, value))
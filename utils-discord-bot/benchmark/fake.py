@@ -0,0 +1,208 @@
+import asyncio
+import itertools
+from typing import Any, Optional
+
+_ids = itertools.count(1)
+
+
+# virtual time: sleeping advances the clock instead of waiting
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def time(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float) -> None:
+        self.now += delay
+
+
+# the network between the bot and discord: every request takes latency seconds and
+# each route allows rate requests per second after a burst of capacity, after which
+# requests wait as the library would after a 429
+class FakeTransport:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        rate: Optional[float] = None,
+        capacity: int = 1,
+        clock: Optional[FakeClock] = None,
+    ) -> None:
+        self.latency = latency
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        # theoretical arrival time of the next request per route
+        self.arrivals: dict[str, float] = {}
+        self.requests = 0
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+
+    def now(self) -> float:
+        if self.clock is not None:
+            return self.clock.now
+        return asyncio.get_running_loop().time()
+
+    async def sleep(self, delay: float) -> None:
+        if self.clock is not None:
+            await self.clock.sleep(delay)
+        else:
+            await asyncio.sleep(delay)
+
+    async def request(self, route: str) -> None:
+        self.requests += 1
+        if self.rate is not None:
+            now = self.now()
+            interval = 1 / self.rate
+            arrival = max(self.arrivals.get(route, now), now)
+            self.arrivals[route] = arrival + interval
+            wait = arrival - (self.capacity - 1) * interval - now
+            if wait > 0:
+                self.throttled += 1
+                self.throttled_seconds += wait
+                await self.sleep(wait)
+        if self.latency > 0:
+            await self.sleep(self.latency)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "throttled_seconds": self.throttled_seconds,
+        }
+
+
+# in-process stand-ins for the discord objects the library talks to
+class FakeReaction:
+    def __init__(self, emoji: Any) -> None:
+        self.emoji = emoji
+        self.me = True
+        self.count = 1
+
+
+class FakeMessage:
+    def __init__(
+        self, channel: "FakeChannel", transport: FakeTransport, **kwargs: Any
+    ) -> None:
+        self.id = next(_ids)
+        self.channel = channel
+        self.transport = transport
+        self.kwargs = kwargs
+        self.reactions: list[FakeReaction] = []
+        self.attachments: list[Any] = []
+        self.edits = 0
+        self.deleted = False
+
+    @property
+    def content(self) -> Optional[str]:
+        return self.kwargs.get("content")
+
+    async def add_reaction(self, emoji: Any) -> None:
+        await self.transport.request("reactions:{0}".format(self.channel.id))
+        self.reactions.append(FakeReaction(emoji))
+
+    async def edit(self, **kwargs: Any) -> "FakeMessage":
+        await self.transport.request("messages:{0}".format(self.channel.id))
+        self.kwargs.update(kwargs)
+        self.edits += 1
+        return self
+
+    async def reply(self, **kwargs: Any) -> "FakeMessage":
+        return await self.channel.send(**kwargs)
+
+    async def delete(self, delay: Optional[float] = None) -> None:
+        if delay is not None:
+            await self.transport.sleep(delay)
+        await self.transport.request("messages:{0}".format(self.channel.id))
+        self.deleted = True
+
+
+class FakeChannel:
+    def __init__(
+        self,
+        id: int,
+        clock: Optional[FakeClock] = None,
+        transport: Optional[FakeTransport] = None,
+    ) -> None:
+        self.id = id
+        self.clock = clock
+        self.transport = FakeTransport(clock=clock) if transport is None else transport
+        self.sent: list[tuple[float, dict[str, Any]]] = []
+
+    async def send(self, **kwargs: Any) -> FakeMessage:
+        await self.transport.request("messages:{0}".format(self.id))
+        self.sent.append((0.0 if self.clock is None else self.clock.now, kwargs))
+        return FakeMessage(self, self.transport, **kwargs)
+
+
+# what send_message returns; like discord.py's InteractionCallbackResponse it is not
+# the message, which is only reachable through resource or original_response()
+class FakeCallbackResponse:
+    def __init__(self, interaction: "FakeInteraction") -> None:
+        self.id = interaction.id
+        self.type = "channel_message"
+        self.resource = interaction.message
+
+
+class FakeInteractionResponse:
+    def __init__(self, interaction: "FakeInteraction") -> None:
+        self.interaction = interaction
+        self.calls: list[tuple[str, dict[str, Any]]] = []
+
+    async def _request(self) -> None:
+        await self.interaction.transport.request(
+            "interactions:{0}".format(self.interaction.id)
+        )
+
+    async def send_message(self, **kwargs: Any) -> FakeCallbackResponse:
+        await self._request()
+        self.calls.append(("send_message", kwargs))
+        self.interaction.message = FakeMessage(
+            self.interaction.channel, self.interaction.transport, **kwargs
+        )
+        return FakeCallbackResponse(self.interaction)
+
+    async def edit_message(self, **kwargs: Any) -> None:
+        await self._request()
+        self.calls.append(("edit_message", kwargs))
+        if self.interaction.message is not None:
+            self.interaction.message.kwargs.update(kwargs)
+            self.interaction.message.edits += 1
+
+    async def send_modal(self, modal: Any) -> None:
+        await self._request()
+        self.calls.append(("send_modal", {"modal": modal}))
+
+    async def defer(self, **kwargs: Any) -> None:
+        await self._request()
+        self.calls.append(("defer", kwargs))
+
+
+class FakeInteraction:
+    def __init__(
+        self,
+        channel: Optional[FakeChannel] = None,
+        transport: Optional[FakeTransport] = None,
+        message: Optional[FakeMessage] = None,
+    ) -> None:
+        self.id = next(_ids)
+        if transport is None:
+            transport = FakeTransport() if channel is None else channel.transport
+        self.transport = transport
+        self.channel = (
+            FakeChannel(id=0, transport=transport) if channel is None else channel
+        )
+        # the message the interaction responded with or, for components, came from
+        self.message = message
+        self.response = FakeInteractionResponse(self)
+
+    async def original_response(self) -> Optional[FakeMessage]:
+        return self.message
+
+    async def edit_original_response(self, **kwargs: Any) -> Optional[FakeMessage]:
+        await self.transport.request("interactions:{0}".format(self.id))
+        self.response.calls.append(("edit_original_response", kwargs))
+        if self.message is not None:
+            self.message.kwargs.update(kwargs)
+            self.message.edits += 1
+        return self.message
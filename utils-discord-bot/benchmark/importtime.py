@@ -0,0 +1,106 @@
+import json
+import os.path
+import subprocess
+import sys
+from typing import Final
+
+PACKAGE_DIRECTORY: Final[str] = os.path.dirname(os.path.dirname(__file__))
+PACKAGE_NAME: Final[str] = __package__.rpartition(".")[0] or "utils_discord_bot"
+
+# imports the package under its own name even if the directory is not importable
+LOAD: Final[str] = """
+import importlib.util, json, sys, time
+before = set(sys.modules)
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location(
+    {name!r}, {init!r}, submodule_search_locations=[{directory!r}]
+)
+package = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = package
+spec.loader.exec_module(package)
+{code}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "modules": sorted(set(sys.modules) - before)}}))
+"""
+
+# what a scenario must not import and how long it may take; short-lived scripts
+# that never parse anything must not pay for discord or lark. The budgets are loose,
+# asyncio alone takes a good part of them on slow machines
+SCENARIOS: Final[dict[str, tuple[str, tuple[str, ...], float]]] = {
+    "package": ("", ("discord", "lark"), 0.05),
+    "commandparser": (
+        "parser = package.CommandParser()\n"
+        "parser.add_argument('--page', '-p')\n"
+        "parser.parse(('list', '-p', '2'))",
+        ("discord", "lark"),
+        0.1,
+    ),
+    "dispatcher": ("package.Dispatcher", ("discord", "lark"), 0.1),
+    "registry": (
+        "package.RunnerRegistry\npackage.ExpiryScheduler",
+        ("discord", "lark"),
+        0.25,
+    ),
+    "metrics": ("package.Metrics\npackage.Profiler", ("discord", "lark"), 0.25),
+}
+
+
+# the modules our code imported that took longest, from -X importtime output
+def slowest(stderr: str, modules: set[str], count: int = 5) -> list[tuple[str, int]]:
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[12:].split("|")
+        # nested entries are part of their parent's cumulative time
+        if not name.startswith("  ") and name.strip() in modules:
+            imports.append((name.strip(), int(cumulative)))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:count]
+
+
+def load(code: str, *options: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [
+            sys.executable,
+            *options,
+            "-c",
+            LOAD.format(
+                name=PACKAGE_NAME,
+                init=os.path.join(PACKAGE_DIRECTORY, "__init__.py"),
+                directory=PACKAGE_DIRECTORY,
+                code=code,
+            ),
+        ],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+
+
+# timed without -X importtime, whose bookkeeping slows imports down
+def measure(name: str) -> dict:
+    code, forbidden, budget = SCENARIOS[name]
+    seconds = json.loads(load(code).stdout)["seconds"]
+    traced = load(code, "-X", "importtime")
+    modules = set(json.loads(traced.stdout)["modules"])
+    imported = [module for module in forbidden if module in modules]
+    return {
+        "scenario": name,
+        "seconds": seconds,
+        "budget_seconds": budget,
+        "forbidden_imports": imported,
+        "slowest_us": slowest(traced.stderr, modules),
+        "ok": not imported and seconds <= budget,
+    }
+
+
+def run() -> list[dict]:
+    return [measure(name) for name in SCENARIOS]
+
+
+# exits with 1 when a scenario imports what it should not or is over budget
+if __name__ == "__main__":
+    results = run()
+    for result in results:
+        print(json.dumps(result))
+    sys.exit(0 if all(result["ok"] for result in results) else 1)
@@ -0,0 +1,104 @@
+import asyncio
+import random
+import time
+
+from ..outbound import (
+    CHANNEL_CAPACITY,
+    CHANNEL_RATE,
+    GLOBAL_CAPACITY,
+    GLOBAL_RATE,
+    OutboundScheduler,
+    Priority,
+)
+from ..window import Window
+from .fake import FakeChannel, FakeClock
+
+EPSILON = 1e-9
+
+
+def check_rate(times: list[float], rate: float, capacity: float) -> None:
+    times = sorted(times)
+    for i in range(len(times)):
+        for j in range(i, len(times)):
+            if j - i + 1 > capacity + (times[j] - times[i]) * rate + EPSILON:
+                raise AssertionError("rate exceeded between {0} and {1}".format(i, j))
+
+
+# runs a broadcast on simulated time and checks the buckets and priorities held
+async def simulate(channel_count: int = 20, sends: int = 20) -> dict[str, float]:
+    clock = FakeClock()
+    outbound = OutboundScheduler(clock=clock.time, sleep=clock.sleep)
+    channels = [FakeChannel(id=i, clock=clock) for i in range(channel_count)]
+    rng = random.Random(0)
+    handles = []
+    for channel in channels:
+        for index in range(sends):
+            priority = rng.choice(list(Priority))
+            window = Window(content="{0}:{1}".format(priority.name, index))
+            handles.append(
+                asyncio.ensure_future(
+                    window.send(channel, outbound=outbound, priority=priority)
+                )
+            )
+    start = time.perf_counter()
+    await asyncio.gather(*handles)
+    wall = time.perf_counter() - start
+
+    all_times = []
+    for channel in channels:
+        times = [sent_at for sent_at, _ in channel.sent]
+        check_rate(times, CHANNEL_RATE, CHANNEL_CAPACITY)
+        all_times.extend(times)
+        priorities = [
+            Priority[kwargs["content"].split(":")[0]] for _, kwargs in channel.sent
+        ]
+        # everything was queued at once, so each channel drains best priority first
+        if priorities != sorted(priorities):
+            raise AssertionError(
+                "priority order broken in channel {0}".format(channel.id)
+            )
+    check_rate(all_times, GLOBAL_RATE, GLOBAL_CAPACITY)
+    return {
+        "channels": channel_count,
+        "sends": channel_count * sends,
+        "simulated_seconds": clock.now,
+        "wall_seconds": wall,
+    }
+
+
+
+# one send per channel, as a broadcast does; the scheduler's cost per send should
+# stay about the same as the number of channels grows
+async def broadcast(
+    channel_counts: tuple[int, ...] = (1000, 2000, 4000)
+) -> list[dict[str, float]]:
+    results = []
+    for channel_count in channel_counts:
+        clock = FakeClock()
+        outbound = OutboundScheduler(clock=clock.time, sleep=clock.sleep)
+        channels = [FakeChannel(id=i, clock=clock) for i in range(channel_count)]
+        window = Window(content="broadcast")
+        start = time.process_time()
+        await asyncio.gather(
+            *(window.send(channel, outbound=outbound) for channel in channels)
+        )
+        cpu = time.process_time() - start
+        results.append(
+            {
+                "channels": channel_count,
+                "cpu_seconds": cpu,
+                "cpu_seconds_per_send": cpu / channel_count,
+                "simulated_seconds": clock.now,
+            }
+        )
+    # quadratic work would make this about channel_counts[-1] / channel_counts[0]
+    growth = results[-1]["cpu_seconds_per_send"] / results[0]["cpu_seconds_per_send"]
+    if growth > 2.5:
+        raise AssertionError("cost per send grew {0:.1f} times".format(growth))
+    return results
+
+if __name__ == "__main__":
+    for key, value in asyncio.run(simulate()).items():
+        print("{0}: {1}".format(key, value))
+    for result in asyncio.run(broadcast()):
+        print(result)
@@ -0,0 +1,98 @@
+import asyncio
+import gc
+import time
+import tracemalloc
+
+import discord
+
+from ..window import Window
+from ..windows import Pages
+from .fake import FakeInteraction
+
+
+def count_instances(cls: type) -> int:
+    return sum(1 for obj in gc.get_objects() if isinstance(obj, cls))
+
+
+async def measure(page_count: int, moves: int = 20) -> dict[str, float]:
+    windows = [Window(content="page {0}".format(i)) for i in range(page_count)]
+    gc.collect()
+    views_before = count_instances(discord.ui.View)
+    buttons_before = count_instances(discord.ui.Button)
+    tasks_before = len(asyncio.all_tasks())
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+
+    pages = Pages(windows)
+    await pages.run(FakeInteraction())
+    for _ in range(min(moves, page_count - 1)):
+        await pages.move_to_side(next=True, interaction=FakeInteraction())
+    await asyncio.gather(*pages.prefetching)
+
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    gc.collect()
+    return {
+        "pages": page_count,
+        "views": count_instances(discord.ui.View) - views_before,
+        "buttons": count_instances(discord.ui.Button) - buttons_before,
+        "tasks": len(asyncio.all_tasks()) - tasks_before,
+        "bytes": sum(stat.size_diff for stat in after.compare_to(before, "filename")),
+    }
+
+
+# the same walk without tracemalloc slowing it down
+async def navigate(page_count: int, moves: int = 20) -> dict[str, float]:
+    windows = [Window(content="page {0}".format(i)) for i in range(page_count)]
+    start = time.perf_counter()
+    pages = Pages(windows)
+    built = time.perf_counter()
+    await pages.run(FakeInteraction())
+    ran = time.perf_counter()
+    steps = min(moves, page_count - 1)
+    for _ in range(steps):
+        await pages.move_to_side(next=True, interaction=FakeInteraction())
+    moved = time.perf_counter()
+    await pages.move_on_page_number(page_count, interaction=FakeInteraction())
+    jumped = time.perf_counter()
+    await asyncio.gather(*pages.prefetching)
+    return {
+        "construct_seconds": built - start,
+        "run_seconds": ran - built,
+        "move_seconds": (moved - ran) / max(steps, 1),
+        "jump_seconds": jumped - moved,
+    }
+
+
+# some slack for allocator noise and the shorter walk through 10 pages
+BYTES_GROWTH_LIMIT = 1.25
+
+
+# the paginator's own footprint should not depend on the number of pages
+async def run() -> list[dict[str, float]]:
+    results = [
+        {**await measure(page_count), **await navigate(page_count)}
+        for page_count in (10, 1_000, 100_000)
+    ]
+    for result in results:
+        if (result["views"], result["buttons"], result["tasks"]) != (1, 3, 0):
+            raise AssertionError(
+                "{0} pages left {1} views, {2} buttons and {3} tasks".format(
+                    result["pages"], result["views"], result["buttons"], result["tasks"]
+                )
+            )
+        if result["bytes"] > results[0]["bytes"] * BYTES_GROWTH_LIMIT:
+            raise AssertionError(
+                "{0} pages took {1} bytes against {2} for {3}".format(
+                    result["pages"],
+                    result["bytes"],
+                    results[0]["bytes"],
+                    results[0]["pages"],
+                )
+            )
+    return results
+
+
+if __name__ == "__main__":
+    for result in asyncio.run(run()):
+        print(result)
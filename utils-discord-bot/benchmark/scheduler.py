@@ -0,0 +1,64 @@
+import asyncio
+import random
+import statistics
+import time
+
+from ..scheduler import ExpiryScheduler
+
+
+class ExpiringRunner:
+    def __init__(self) -> None:
+        self.deadline = 0.0
+        self.destroyed_at = None
+
+    async def destroy(self) -> None:
+        self.destroyed_at = time.monotonic()
+
+
+# schedules runner_count runners over spread seconds, refreshes a share of them and
+# measures how late each one is destroyed after its deadline
+async def expire(
+    runner_count: int, spread: float = 1.0, touch_ratio: float = 0.2
+) -> dict[str, float]:
+    rng = random.Random(0)
+    runners = [ExpiringRunner() for _ in range(runner_count)]
+    expired: list[ExpiringRunner] = []
+    scheduler = ExpiryScheduler(on_expire=expired.append)
+
+    start = time.perf_counter()
+    for runner in runners:
+        delay = rng.uniform(0, spread)
+        runner.deadline = time.monotonic() + delay
+        scheduler.schedule(runner, delay)
+    scheduled = time.perf_counter()
+    touched = rng.sample(runners, int(runner_count * touch_ratio))
+    for runner in touched:
+        delay = rng.uniform(0, spread)
+        runner.deadline = time.monotonic() + delay
+        scheduler.schedule(runner, delay)
+    refreshed = time.perf_counter()
+
+    while len(expired) < runner_count:
+        await asyncio.sleep(0.05)
+    scheduler.stop()
+
+    lateness = sorted(runner.destroyed_at - runner.deadline for runner in runners)
+    if lateness[0] < 0:
+        raise AssertionError("runner destroyed before its deadline")
+    return {
+        "runners": runner_count,
+        "schedule_us": (scheduled - start) / runner_count * 1e6,
+        "touch_us": (refreshed - scheduled) / max(len(touched), 1) * 1e6,
+        "lateness_median_ms": statistics.median(lateness) * 1e3,
+        "lateness_p99_ms": lateness[int(len(lateness) * 0.99)] * 1e3,
+        "lateness_max_ms": lateness[-1] * 1e3,
+    }
+
+
+async def run() -> list[dict[str, float]]:
+    return [await expire(runner_count) for runner_count in (1_000, 10_000, 100_000)]
+
+
+if __name__ == "__main__":
+    for result in asyncio.run(run()):
+        print(result)
@@ -0,0 +1,116 @@
+import asyncio
+import inspect
+import time
+import tracemalloc
+
+import discord
+
+from ..reactions import reaction_pipeline
+from ..window import Window
+from .fake import FakeChannel, FakeTransport
+
+
+DEFAULTS = {
+    name: parameter.default
+    for name, parameter in inspect.signature(Window.__init__).parameters.items()
+    if name != "self"
+}
+
+
+# the Window before it had slots: a __dict__ per instance, and all four send/edit
+# kwargs dicts built by the constructor and so by every copy()
+class LegacyWindow:
+    def __init__(self, **fields) -> None:
+        for name in Window.FIELDS:
+            setattr(self, name, fields.get(name, DEFAULTS[name]))
+        self._kwargs = None
+        (
+            self.args_messageable_send,
+            self.args_messageable_edit,
+            self.args_interaction_send,
+            self.args_interaction_edit,
+        ) = Window._get_kwargs(self)
+        del self._kwargs
+
+    def copy(self, **changes) -> "LegacyWindow":
+        fields = {name: getattr(self, name) for name in Window.FIELDS}
+        fields.update(changes)
+        return LegacyWindow(**fields)
+
+
+def measure(pages: int, kind: str) -> float:
+    window_type = LegacyWindow if kind == "legacy" else Window
+    base = window_type(
+        embed=discord.Embed(title="page"), emojis=["⬅️", "➡️"], silent=True
+    )
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    windows = []
+    for index in range(pages):
+        window = base.copy(content="page {0}".format(index))
+        # a slotted window that was sent once has its kwargs built
+        if kind == "sent":
+            window.args_messageable_send
+        windows.append(window)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return size / pages
+
+
+def run(pages: int = 10_000) -> dict[str, float]:
+    legacy = measure(pages, "legacy")
+    sent = measure(pages, "sent")
+    lazy = measure(pages, "lazy")
+    return {
+        "pages": pages,
+        "legacy_bytes_per_page": legacy,
+        "sent_bytes_per_page": sent,
+        "lazy_bytes_per_page": lazy,
+        "ratio": legacy / lazy,
+    }
+
+
+# sends and edits one window per channel over a transport with latency and rate
+# limits; reactions keep being added in the background after send returns
+async def send_edit(
+    channels: int = 100,
+    emojis: int = 3,
+    latency: float = 0.005,
+    rate: float = 5.0,
+    capacity: int = 5,
+) -> dict[str, float]:
+    transport = FakeTransport(latency=latency, rate=rate, capacity=capacity)
+    targets = [FakeChannel(id=i, transport=transport) for i in range(channels)]
+    window = Window(
+        content="page",
+        emojis=["{0}\N{COMBINING ENCLOSING KEYCAP}".format(i) for i in range(emojis)],
+    )
+    # the reactions are already on their way, so the edit does not add them again
+    edited = window.copy(content="edited", emojis=None)
+
+    start = time.perf_counter()
+    messages = await asyncio.gather(*(window.send(channel) for channel in targets))
+    sent = time.perf_counter()
+    await asyncio.gather(*(edited.edit(message) for message in messages))
+    edits = time.perf_counter()
+    await reaction_pipeline.drain()
+    drained = time.perf_counter()
+
+    if any(len(message.reactions) != emojis for message in messages):
+        raise AssertionError("missing reactions")
+    return {
+        "channels": channels,
+        "latency": latency,
+        "sends_per_second": channels / (sent - start),
+        "edits_per_second": channels / (edits - sent),
+        "reactions_per_second": channels * emojis / (drained - start),
+        **transport.stats(),
+    }
+
+
+if __name__ == "__main__":
+    for key, value in run().items():
+        print("{0}: {1}".format(key, value))
+    for key, value in asyncio.run(send_edit()).items():
+        print("{0}: {1}".format(key, value))
@@ -1,9 +1,18 @@
+import asyncio
+import io
+import secrets
 import discord
-from discord.ext import commands, tasks
+from discord import app_commands
+from discord.ext import commands
 
-from commandparser import commandparser
-from runner import Runner
-from typing import List
+from . import commandparser
+from .attachments import forget_message
+from .profiling import Profiler, ProfileSession
+from .registry import RunnerRegistry
+from .runner import Runner
+from .scheduler import ExpiryScheduler
+from .sessions import MemorySessionStore, SessionStore
+from typing import Any, Optional
 
 class GroupCog(commands.GroupCog):
     def __init__(self, bot: discord.ext.commands.Bot, allow_duplicated: bool):
@@ -13,18 +22,264 @@ class GroupCog(commands.GroupCog):
 
 
 class Command(commands.Cog):
-    MINUTES = 3.0
-
-    def __init__(self, bot: discord.ext.commands.Bot, allow_duplicated=False):
+    def __init__(
+        self,
+        bot: discord.ext.commands.Bot,
+        allow_duplicated=False,
+        sessions: Optional[SessionStore] = None,
+    ):
         self.bot = bot
         self.allow_duplicated = allow_duplicated
         self.parser = commandparser.CommandParser()
-        self.runners: List[Runner] = []
-
-    @tasks.loop(minutes=MINUTES)
-    async def timeout_check(self):
-        self.runners = [
-            runner
-            for runner in self.runners
-            if await runner.timeout_check(minutes=Command.MINUTES)
-        ]
\ No newline at end of file
+        self.runners = RunnerRegistry()
+        self.scheduler = ExpiryScheduler(
+            on_expire=self.runners.remove, should_destroy=self._owns
+        )
+        self.profiler = Profiler()
+        self.profile_replies: set[asyncio.Task] = set()
+        # runners of registered types are shared through the store, so that another
+        # process or shard receiving their interactions can take them over
+        self.sessions = MemorySessionStore() if sessions is None else sessions
+        self.runner_types: dict[str, type[Runner]] = {}
+        # tells this process's records apart from those of other processes
+        self.owner = secrets.token_hex(8)
+        # session key -> the resume of that session under way
+        self.resuming: dict[str, asyncio.Future] = {}
+
+    def is_duplicated(self, channel_id: int, user_id: Optional[int] = None) -> bool:
+        return not self.allow_duplicated and self.runners.has_active(
+            channel_id=channel_id, user_id=user_id
+        )
+
+    def add_runner(self, runner: Runner):
+        self.runners.add(
+            runner,
+            channel_id=runner.channel.id,
+            user_id=None if runner.user is None else runner.user.id,
+        )
+        runner.attach_scheduler(self.scheduler)
+        if type(runner).__name__ in self.runner_types and runner.session_key is None:
+            runner.session_key = secrets.token_urlsafe(12)
+            # a runner without session state stays local
+            if not self.save_runner(runner):
+                runner.session_key = None
+
+    # routes interactions and reactions on the message to the runner and target
+    def bind_message(self, runner: Runner, message: discord.Message, target: Any = None):
+        self.runners.bind_message(runner, message_id=message.id, target=target)
+        self.save_runner(runner)
+
+    def remove_runner(self, runner: Runner):
+        if runner.session_key is not None and runner in self.runners:
+            self.sessions.delete("runner:" + runner.session_key)
+            for message_id in self.runners.keys[runner][2]:
+                self.sessions.delete("message:{0}".format(message_id))
+        self.runners.remove(runner)
+        self.scheduler.cancel(runner)
+
+    # runners of a registered type implement session_state and from_session
+    def register_runner_type(self, runner_type: type[Runner]):
+        self.runner_types[runner_type.__name__] = runner_type
+
+    # writes the runner's state to the store; call it again after the state changed.
+    # Returns whether anything was written
+    def save_runner(self, runner: Runner) -> bool:
+        if runner.session_key is None or runner not in self.runners:
+            return False
+        state = runner.session_state()
+        if state is None:
+            return False
+        channel_id, user_id, message_ids = self.runners.keys[runner]
+        ttl = None if runner.timeout is None else runner.timeout * 60
+        self.sessions.put(
+            "runner:" + runner.session_key,
+            {
+                "type": type(runner).__name__,
+                "owner": self.owner,
+                "channel_id": channel_id,
+                "user_id": user_id,
+                "timeout": runner.timeout,
+                "messages": sorted(message_ids),
+                "state": state,
+            },
+            ttl=ttl,
+        )
+        for message_id in message_ids:
+            self.sessions.put(
+                "message:{0}".format(message_id),
+                {"runner": runner.session_key},
+                ttl=ttl,
+            )
+        return True
+
+    # whether an expiring runner is still this process's to destroy; a runner taken
+    # over by another process is only dropped here, its messages are in use there
+    async def _owns(self, runner: Runner) -> bool:
+        if runner.session_key is None:
+            return True
+        key = "runner:" + runner.session_key
+        # destroying on a stale read would tear down messages another process serves
+        self.sessions.invalidate(key)
+        record = await self.sessions.get(key)
+        return record is None or record["owner"] == self.owner
+
+    # drops the runner here without touching the store, once another process took it
+    def _forget(self, runner: Runner):
+        self.runners.remove(runner)
+        self.scheduler.cancel(runner)
+
+    # rebuilds the runner owning the message from the store and takes it over; events
+    # arriving while that is under way wait for the same runner instead of building
+    # another one for the session
+    async def _resume(self, message_id: int) -> Optional[RunnerRegistry.Route]:
+        binding = await self.sessions.get("message:{0}".format(message_id))
+        if binding is None:
+            return None
+        key = binding["runner"]
+        resuming = self.resuming.get(key)
+        if resuming is None:
+            resuming = asyncio.ensure_future(self._rebuild(key))
+            self.resuming[key] = resuming
+            resuming.add_done_callback(lambda _: self.resuming.pop(key, None))
+        # one caller giving up must not cancel the resume for the others
+        if await asyncio.shield(resuming) is None:
+            return None
+        return self.runners.route(message_id)
+
+    async def _rebuild(self, key: str) -> Optional[Runner]:
+        record = await self.sessions.get("runner:" + key)
+        if record is None:
+            return None
+        runner_type = self.runner_types.get(record["type"])
+        channel = self.bot.get_channel(record["channel_id"])
+        if runner_type is None or channel is None:
+            return None
+        user = None
+        if record["user_id"] is not None:
+            user = self.bot.get_user(record["user_id"])
+            if user is None:
+                user = await self.bot.fetch_user(record["user_id"])
+        # the session may have been resumed here while this one was awaiting
+        for bound_id in record["messages"]:
+            route = self.runners.route(bound_id)
+            if route is not None and route.runner.session_key == key:
+                return route.runner
+        runner = runner_type.from_session(
+            channel, user, record["timeout"], record["state"]
+        )
+        runner.session_key = key
+        self.runners.add(runner, channel_id=channel.id, user_id=record["user_id"])
+        runner.attach_scheduler(self.scheduler)
+        for bound_id in record["messages"]:
+            self.runners.bind_message(runner, message_id=bound_id)
+        self.save_runner(runner)
+        return runner
+
+    # the local route while this process owns the runner, otherwise the resumed one;
+    # the second value tells whether the runner was just resumed
+    async def _route(
+        self, message_id: int
+    ) -> tuple[Optional[RunnerRegistry.Route], bool]:
+        route = self.runners.route(message_id)
+        if route is not None:
+            runner = route.runner
+            if runner.session_key is None:
+                return route, False
+            record = await self.sessions.get("runner:" + runner.session_key)
+            if record is not None and record["owner"] == self.owner:
+                return route, False
+            self._forget(runner)
+            if record is None:
+                return None, False
+        route = await self._resume(message_id)
+        return route, route is not None
+
+    @commands.Cog.listener()
+    async def on_interaction(self, interaction: discord.Interaction):
+        if interaction.type is not discord.InteractionType.component:
+            return
+        if interaction.message is None:
+            return
+        route, resumed = await self._route(interaction.message.id)
+        if route is not None:
+            route.runner.touch()
+            self.save_runner(route.runner)
+            if resumed:
+                await route.runner.on_resume(interaction, route.target)
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
+        if self.bot.user is not None and payload.user_id == self.bot.user.id:
+            return
+        route, resumed = await self._route(payload.message_id)
+        if route is not None:
+            route.runner.touch()
+            self.save_runner(route.runner)
+            if resumed:
+                await route.runner.on_resume(None, route.target)
+            await route.runner.on_reaction(payload, route.target)
+
+    # reused attachment URLs die with the message they were uploaded to
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        forget_message(payload.message_id)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(
+        self, payload: discord.RawBulkMessageDeleteEvent
+    ):
+        for message_id in payload.message_ids:
+            forget_message(message_id)
+
+    # every command callback goes through the profiler, which only looks the name up
+    # until the command is armed
+    async def cog_load(self) -> None:
+        for command in self.walk_app_commands():
+            # app commands have no public setter for their callback
+            if isinstance(command, app_commands.Command) and not hasattr(
+                command._callback, "__profiled__"
+            ):
+                command._callback = self.profiler.wrap(
+                    command.qualified_name, command._callback
+                )
+        for command in self.walk_commands():
+            if not hasattr(command.callback, "__profiled__"):
+                command.callback = self.profiler.wrap(
+                    command.qualified_name, command.callback
+                )
+
+    # profiles the next count invocations of the command, and the callbacks of the
+    # paginators they start, into a pstats file; with reply_to the file is sent there
+    # once the invocations finished
+    def profile(
+        self,
+        name: str,
+        count: int = 1,
+        path: Optional[str] = None,
+        reply_to: Optional[discord.abc.Messageable] = None,
+    ) -> ProfileSession:
+        session = self.profiler.arm(name, count=count, path=path)
+        if reply_to is not None:
+            task = asyncio.create_task(self._reply_profile(session, reply_to))
+            self.profile_replies.add(task)
+            task.add_done_callback(self.profile_replies.discard)
+        return session
+
+    async def _reply_profile(
+        self, session: ProfileSession, reply_to: discord.abc.Messageable
+    ):
+        path = await session.wait()
+        summary = session.report(limit=15)
+        await reply_to.send(
+            content="{0}: {1} invocation(s)".format(session.name, session.invocations),
+            files=[
+                discord.File(path),
+                discord.File(io.BytesIO(summary.encode()), filename="summary.txt"),
+            ],
+        )
+
+    async def cog_unload(self) -> None:
+        self.scheduler.stop()
+        for task in self.profile_replies:
+            task.cancel()
+        await self.sessions.close()
\ No newline at end of file
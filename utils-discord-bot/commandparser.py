@@ -1,23 +1,97 @@
+import hashlib
+import logging
 import os.path
 import re
+import stat
+import threading
 import typing
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from functools import reduce
-from typing import Union, Final
+from types import MappingProxyType
+from typing import Union, Final, NamedTuple, Optional
 
-import discord
-import lark.exceptions
-from lark import Lark
-from lark import Transformer
+from .metrics import metrics
+
+# discord and lark are imported on first use, so that importing the parser is cheap
+if typing.TYPE_CHECKING:
+    import discord
+    from lark import Lark
 
 DIRECTORY_NAME: Final[str] = os.path.dirname(__file__)
+GRAMMAR_PATH: Final[str] = os.path.join(DIRECTORY_NAME, 'commandparser.lark')
+# lark unpickles the cache file before checking it, so it must live where only this
+# user can write, never in the shared temporary directory
+CACHE_DIRECTORY: Final[str] = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'utils-discord-bot',
+)
+
+logger = logging.getLogger(__name__)
+metrics.describe('commandparser_parse_seconds', 'Time spent parsing command arguments.')
+
+
+# a process-wide store of compiled grammars shared by every CommandParser
+class GrammarRegistry:
+    def __init__(self, cache_directory: str = CACHE_DIRECTORY) -> None:
+        self.cache_directory = cache_directory
+        self.parsers: dict[str, 'Lark'] = {}
+        self.lock = threading.Lock()
+
+    # a directory owned by this user and closed to everyone else, or None to go without
+    # the cache
+    def _private_directory(self) -> Optional[str]:
+        try:
+            os.makedirs(self.cache_directory, mode=0o700, exist_ok=True)
+            status = os.lstat(self.cache_directory)
+        except OSError:
+            return None
+        if not stat.S_ISDIR(status.st_mode) or status.st_mode & 0o077:
+            return None
+        if hasattr(os, 'getuid') and status.st_uid != os.getuid():
+            return None
+        return self.cache_directory
+
+    def _cache_path(self, grammar: str) -> Optional[str]:
+        directory = self._private_directory()
+        if directory is None:
+            return None
+        digest = hashlib.sha256(grammar.encode('utf-8')).hexdigest()
+        return os.path.join(directory, 'commandparser_{0}.lark_cache'.format(digest))
+
+    def get(self, path: str = GRAMMAR_PATH) -> 'Lark':
+        with self.lock:
+            if path not in self.parsers:
+                from lark import Lark
+
+                with open(path, encoding='utf-8') as grammar_file:
+                    grammar = grammar_file.read()
+                # the file name carries the grammar hash, so an edited grammar gets a new cache
+                cache_path = self._cache_path(grammar)
+                self.parsers[path] = Lark(
+                    grammar, parser='lalr', cache=False if cache_path is None else cache_path
+                )
+            return self.parsers[path]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.parsers.clear()
+
+
+grammar_registry = GrammarRegistry()
+
+# whitespace other than ASCII; input containing it is left to lark
+UNHANDLED_SPACE_PATTERN: Final[re.Pattern] = re.compile(r'[^\S \t\f\r\n]')
+SHORT_FLAG_PATTERN: Final[re.Pattern] = re.compile(r'-[a-zA-Z]')
+LONG_FLAG_PATTERN: Final[re.Pattern] = re.compile(r'--[a-zA-Z]+')
 
 
 class CommandParserError(Exception):
     def __init__(self):
-        self.embed: Union[discord.Embed, None] = None
+        self.embed: Union['discord.Embed', None] = None
 
-    def send(self, channel: discord.TextChannel):
+    def send(self, channel: 'discord.TextChannel'):
         channel.send(embed=self.embed)
 
 
@@ -39,7 +113,9 @@ class InputArgumentError(CommandParserError):
 
 class InputDuplicatedArgumentError(InputArgumentError):
     def __init__(self, arg_name: str):
-        super.__init__()
+        super().__init__()
+        import discord
+
         self.embed = discord.Embed(
             title='エラー', description='同一の引数が複数指定されています。', color=discord.Color.red()
         )
@@ -49,23 +125,52 @@ class InputDuplicatedArgumentError(InputArgumentError):
 class InputInvalidArgumentNameError(InputArgumentError):
     def __init__(self, arg_name: str):
         super().__init__()
+        import discord
+
         self.embed = discord.Embed(
             title='エラー', description='不正な引数が指定されています。', color=discord.Color.red()
         )
         self.embed.add_field(name='引数名', value=arg_name)
 
 
+# input the grammar cannot make sense of
+class InputSyntaxError(InputArgumentError):
+    def __init__(self, command_line: str):
+        super().__init__()
+        import discord
+
+        self.embed = discord.Embed(
+            title='エラー', description='入力を解釈できません。', color=discord.Color.red()
+        )
+        self.embed.add_field(name='入力', value=command_line[:1024] or '(空)')
+
+
 class InputInsufficientRequiredArgumentError(InputArgumentError):
     def __init__(self, arg_name: str):
         super().__init__()
+        import discord
+
         self.embed = discord.Embed(
             title='エラー', description='必要な引数が入力されていません。', color=discord.Color.red()
         )
         self.embed.add_field(name='引数名', value=arg_name)
 
 
-# a class used to parse arguments when commands called
-class CommandParser:
+# resolves to the class made by the factory when looked up on a class or instance
+class _LazyClass:
+    def __init__(self, factory: typing.Callable[[], type]) -> None:
+        self.factory = factory
+        self.cls: Union[type, None] = None
+
+    def __get__(self, instance, owner) -> type:
+        if self.cls is None:
+            self.cls = self.factory()
+        return self.cls
+
+
+def _command_transformer() -> type:
+    from lark import Transformer
+
     class CommandTransformer(Transformer):
         def statement(self, tree) -> (list, list):
             if len(tree) == 0:
@@ -101,8 +206,20 @@ class CommandParser:
         def word(self, tree):
             return tree[0].lower()
 
-        def letter(self, tree):
-            return tree[0].lower()
+        def SHORT_FLAG(self, token):
+            return token[1:].lower()
+
+        def LONG_FLAG(self, token):
+            return token[2:].lower()
+
+    CommandTransformer.__qualname__ = 'CommandParser.CommandTransformer'
+    return CommandTransformer
+
+
+# a class used to parse arguments when commands called
+class CommandParser:
+    # built on first access, since it needs lark
+    CommandTransformer = _LazyClass(_command_transformer)
 
     @dataclass
     class Arg:
@@ -113,20 +230,41 @@ class CommandParser:
     class OptArg(Arg):
         omitted_flag: str
 
-    @dataclass
+    @dataclass(frozen=True)
     class Namespace:
-        args: dict
-
-    def __init__(self) -> None:
+        args: typing.Mapping
+
+    class CacheInfo(NamedTuple):
+        hits: int
+        misses: int
+        maxsize: int
+        currsize: int
+
+    @dataclass(frozen=True)
+    class Spec:
+        positionals: typing.Tuple['CommandParser.Arg', ...]
+        # both long and omitted flags -> argument
+        optionals: typing.Mapping[str, 'CommandParser.OptArg']
+        # both long and omitted flags -> long flag
+        long_names: typing.Mapping[str, str]
+        required: typing.Tuple[str, ...]
+
+    def __init__(self, cache_size: int = 0) -> None:
         self.arguments: dict[str: CommandParser.Arg] = {}
         self.argument_names: list[str] = []
-        with open(os.path.join(DIRECTORY_NAME, 'commandparser.lark'), encoding="utf-8") as grammar:
-            self.parser = Lark(grammar.read())
+        self._parser: Union['Lark', None] = None
+        self.spec: Union[CommandParser.Spec, None] = None
 
-        self.tree: Union[lark.Tree, None] = None
         self.result = None
         self.namespace: Union[CommandParser.Namespace, None] = None
 
+        # parsed command lines are memoized only if cache_size is positive
+        self.cache_size = cache_size
+        self.cache: OrderedDict[tuple, typing.Tuple[tuple, CommandParser.Namespace]] = OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
     @staticmethod
     def _is_arg_name(arg: str) -> bool:
         p = re.compile(r'[a-zA-Z]+')
@@ -150,6 +288,8 @@ class CommandParser:
 
     def add_argument(self, *args: str, required=False):
         assert 1 <= len(args) <= 2
+        self.spec = None
+        self.clear_cache()
         if len(args) == 1:
             # if add positional argument
             if CommandParser._is_arg_name(args[0]):
@@ -178,8 +318,7 @@ class CommandParser:
             if CommandParser._is_flag(args[0]) and CommandParser._is_omitted_flag(args[1]):
                 flag = args[0][2:]
                 omitted_flag = args[1][1:]
-                print(flag)
-                print(omitted_flag)
+                logger.debug('add optional argument', extra={'flag': flag, 'omitted_flag': omitted_flag})
                 if flag in self.argument_names or omitted_flag in self.argument_names:
                     raise SetDuplicatedArgumentError
                 else:
@@ -193,50 +332,181 @@ class CommandParser:
             else:
                 raise SetInvalidArgumentNameError
 
-    def analyze_arguments(self):
-        self.namespace = CommandParser.Namespace({})
+    # freeze the arguments added so far into lookup tables used by analyze_arguments
+    def compile(self) -> Spec:
+        optionals: dict[str, CommandParser.OptArg] = {}
+        long_names: dict[str, str] = {}
+        required: list[str] = []
+        for flag, arg in self.arguments.items():
+            if type(arg) is CommandParser.OptArg:
+                optionals[flag] = arg
+                long_names[flag] = arg.name
+                if arg.required and arg.name not in required:
+                    required.append(arg.name)
+        self.spec = CommandParser.Spec(
+            positionals=tuple(self._get_positional_arguments()),
+            optionals=MappingProxyType(optionals),
+            long_names=MappingProxyType(long_names),
+            required=tuple(required),
+        )
+        return self.spec
+
+    # builds a namespace from a tokenized input without touching the parser's state;
+    # it is immutable, so that it can be cached and shared whether or not it is
+    def _analyze(self, result: typing.Tuple[list, list]) -> Namespace:
+        spec = self.spec if self.spec is not None else self.compile()
+        args: dict[str, typing.Any] = {}
+        positionals, optionals = result
         # analyze positional arguments
-        pos_args = self._get_positional_arguments()
-        if len(self.result[0]) < len(pos_args):
+        pos_args = spec.positionals
+        if len(positionals) < len(pos_args):
             raise InputInsufficientRequiredArgumentError(arg_name=pos_args[-1].name)
         else:
-            index = 0
-            for pos_arg in pos_args:
-                if index >= len(pos_args) - 1 and len(self.result[0][index:]) > 1:
-                    self.namespace.__dict__[pos_arg.name] = self.result[0][index:]
-                    self.namespace.args[pos_arg.name] = self.result[0][index:]
+            last = len(pos_args) - 1
+            for index, pos_arg in enumerate(pos_args):
+                if index == last and len(positionals) - index > 1:
+                    args[pos_arg.name] = tuple(positionals[index:])
                 else:
-                    self.namespace.__dict__[pos_arg.name] = self.result[0][index]
-                    self.namespace.args[pos_arg.name] = self.result[0][index]
-                index += 1
+                    args[pos_arg.name] = positionals[index]
+
+        # check if a user did not input invalid or duplicated args
+        inputted: set[str] = set()
+        for inp in optionals:
+            name = spec.long_names.get(inp[0])
+            if name is None:
+                raise InputInvalidArgumentNameError(arg_name=inp[0])
+            if name in inputted:
+                raise InputDuplicatedArgumentError(arg_name=inp[0])
+            inputted.add(name)
 
-        opt_args = self._get_optional_arguments()
         # check if a user inputted all required args
-        for opt_arg in opt_args:
-            if opt_arg.required and opt_arg.name not in [i[0] for i in self.result[1]]:
-                raise InputInsufficientRequiredArgumentError(arg_name=opt_arg.name)
+        for name in spec.required:
+            if name not in inputted:
+                raise InputInsufficientRequiredArgumentError(arg_name=name)
 
-        # check if a user did not input invalid args
-        for inp in self.result[1]:
-            if inp[0] not in [i.name for i in opt_args] + [i.omitted_flag for i in opt_args]:
-                raise InputInvalidArgumentNameError(arg_name=inp[0])
+        for inp in optionals:
+            args[inp[0]] = tuple(inp[1:])
+        namespace = CommandParser.Namespace(MappingProxyType(args))
+        namespace.__dict__.update(args)
+        return namespace
 
-        # check if a user did not input duplicated args
-        for i in self.result[1]:
-            if self.result[1].count(i) > 1:
-                raise InputDuplicatedArgumentError(arg_name=i[0])
+    def analyze_arguments(self):
+        self.namespace = self._analyze(self.result)
 
-        for inp in self.result[1]:
-            self.namespace.__dict__[inp[0]] = inp[1:]
-            self.namespace.args[inp[0]] = inp[1:]
+    # a single-pass equivalent of the grammar and CommandTransformer
+    # returns None when the input has to go through lark
+    @staticmethod
+    def _scan(args: typing.Tuple[str]) -> Union[typing.Tuple[list, list], None]:
+        positionals: list[str] = []
+        optionals: list[list[str]] = []
+        for arg in args:
+            if UNHANDLED_SPACE_PATTERN.search(arg):
+                return None
+            for token in arg.split():
+                if SHORT_FLAG_PATTERN.fullmatch(token):
+                    optionals.append([token[1:].lower()])
+                elif LONG_FLAG_PATTERN.fullmatch(token):
+                    optionals.append([token[2:].lower()])
+                elif optionals:
+                    optionals[-1].append(token.lower())
+                else:
+                    positionals.append(token.lower())
+        return positionals, optionals
+
+    # the grammar is loaded by the first command line the fast path cannot handle
+    @property
+    def parser(self) -> 'Lark':
+        if self._parser is None:
+            self._parser = grammar_registry.get()
+        return self._parser
+
+    def _tokenize(self, args: typing.Tuple[str]) -> typing.Tuple[list, list]:
+        result = CommandParser._scan(args)
+        if result is None:
+            from lark.exceptions import LarkError
+
+            command_line = reduce(lambda x, y: x + ' ' + y, args, '')
+            try:
+                tree = self.parser.parse(command_line)
+            except LarkError:
+                raise InputSyntaxError(command_line=command_line.strip()) from None
+            result = self.CommandTransformer().transform(tree)
+        return result
+
+    # results may be shared between callers, so they are immutable on every path
+    @staticmethod
+    def _freeze(result: typing.Tuple[list, list]) -> typing.Tuple[tuple, tuple]:
+        return tuple(result[0]), tuple(tuple(i) for i in result[1])
+
+    def _lookup(self, args: typing.Tuple[str]) -> typing.Tuple[tuple, Namespace]:
+        if self.cache_size <= 0:
+            result = self._tokenize(args)
+            return CommandParser._freeze(result), self._analyze(result)
+
+        key = tuple(args)
+        with self.cache_lock:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache.move_to_end(key)
+                self.cache_hits += 1
+                return cached
+            self.cache_misses += 1
+
+        result = self._tokenize(args)
+        cached = CommandParser._freeze(result), self._analyze(result)
+        with self.cache_lock:
+            self.cache[key] = cached
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return cached
+
+    def cache_info(self) -> CacheInfo:
+        with self.cache_lock:
+            return CommandParser.CacheInfo(
+                hits=self.cache_hits,
+                misses=self.cache_misses,
+                maxsize=self.cache_size,
+                currsize=len(self.cache),
+            )
+
+    def clear_cache(self) -> None:
+        with self.cache_lock:
+            self.cache.clear()
+
+    # reentrant: nothing is stored on the parser apart from the cache, so it can be
+    # shared between concurrent invocations and threads
+    def parse(self, args: typing.Tuple[str]) -> Namespace:
+        with metrics.timer('commandparser_parse_seconds', method='parse'):
+            return self._lookup(args)[1]
+
+    def parse_many(
+        self,
+        lines: typing.Iterable[typing.Tuple[str]],
+        max_workers: Union[int, None] = None,
+        return_exceptions: bool = False,
+    ) -> list[Union[Namespace, CommandParserError]]:
+        # compile once up front instead of racing to do so in every worker
+        if self.spec is None:
+            self.compile()
+
+        def parse(args: typing.Tuple[str]) -> Union[CommandParser.Namespace, CommandParserError]:
+            try:
+                return self.parse(args)
+            except CommandParserError as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        if max_workers is None:
+            return [parse(args) for args in lines]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(parse, lines))
 
     def parse_args(self, args: typing.Tuple[str]) -> Namespace:
-        print(args)
-        self.tree = self.parser.parse(reduce(lambda x, y: x + ' ' + y, args, ''))
-        print(self.tree.pretty())
-        self.result = self.CommandTransformer().transform(self.tree)
-        print(self.result)
-        self.analyze_arguments()
+        with metrics.timer('commandparser_parse_seconds', method='parse_args'):
+            self.result, self.namespace = self._lookup(args)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('parsed arguments', extra={'command_args': args, 'result': self.result})
         return self.namespace
 
     def get_help(self):
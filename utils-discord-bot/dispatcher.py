@@ -0,0 +1,68 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional
+
+from .commandparser import CommandParser
+from .trie import Trie
+
+if TYPE_CHECKING:
+    import discord
+
+
+# routes prefixed text messages to the CommandParser of the matching command
+class Dispatcher:
+    @dataclass(frozen=True)
+    class Entry:
+        name: str
+        parser: CommandParser
+        callback: Callable[
+            ["discord.Message", CommandParser.Namespace], Awaitable[None]
+        ]
+
+    @dataclass(frozen=True)
+    class Match:
+        entry: "Dispatcher.Entry"
+        args: tuple[str, ...]
+
+    def __init__(self, prefix: str) -> None:
+        if len(prefix) == 0:
+            raise ValueError
+        self.prefix = prefix
+        self.commands: Trie[Dispatcher.Entry] = Trie()
+
+    def register(
+        self,
+        name: str,
+        parser: CommandParser,
+        callback: Callable[
+            ["discord.Message", CommandParser.Namespace], Awaitable[None]
+        ],
+    ) -> None:
+        if len(name) == 0 or any(char.isspace() for char in name):
+            raise ValueError
+        # flags are checked by the parser itself, against its current spec
+        self.commands.insert(
+            name, Dispatcher.Entry(name=name, parser=parser, callback=callback)
+        )
+
+    def match(self, content: str) -> Optional[Match]:
+        if not content.startswith(self.prefix):
+            return None
+        start = len(self.prefix)
+        found: Optional[tuple[int, Dispatcher.Entry]] = None
+        # a command name has to be followed by whitespace or the end of the message
+        for end, entry in self.commands.prefixes(content, start):
+            if end == len(content) or content[end].isspace():
+                found = (end, entry)
+        if found is None:
+            return None
+        end, entry = found
+        return Dispatcher.Match(entry=entry, args=tuple(content[end:].split()))
+
+    # returns False without parsing anything if the message is not a command
+    async def dispatch(self, message: "discord.Message") -> bool:
+        match = self.match(message.content)
+        if match is None:
+            return False
+        namespace = match.entry.parser.parse(match.args)
+        await match.entry.callback(message, namespace)
+        return True
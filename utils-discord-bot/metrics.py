@@ -0,0 +1,275 @@
+import bisect
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Final,
+    Iterator,
+    Optional,
+    Sequence,
+    TypeVar,
+)
+
+# asyncio is only needed to serve the metrics
+if TYPE_CHECKING:
+    import asyncio
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+LATENCY_BUCKETS: Final = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+LIFETIME_BUCKETS: Final = (
+    1.0,
+    10.0,
+    60.0,
+    300.0,
+    900.0,
+    1800.0,
+    3600.0,
+    10800.0,
+    86400.0,
+)
+CONTENT_TYPE: Final = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = buckets
+        # the last count is for values above every bucket (+Inf)
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[int]:
+        counts = []
+        total = 0
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    labels = labels + extra
+    if not labels:
+        return ""
+    return "{" + ",".join('{0}="{1}"'.format(k, _escape(v)) for k, v in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# in-process counters and latency histograms, readable as a snapshot or in the
+# Prometheus text format
+class Metrics:
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.descriptions: dict[str, str] = {}
+        self.buckets: dict[str, Sequence[float]] = {}
+        self.histograms: dict[str, dict[Labels, Histogram]] = {}
+        self.counters: dict[str, dict[Labels, float]] = {}
+
+    def describe(
+        self, name: str, help: str, buckets: Optional[Sequence[float]] = None
+    ) -> None:
+        self.descriptions[name] = help
+        if buckets is not None:
+            self.buckets[name] = tuple(sorted(buckets))
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        if not self.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(
+                    self.buckets.get(name, LATENCY_BUCKETS)
+                )
+            histogram.observe(value)
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        if not self.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    # times every call of a (coroutine) function, failed calls included
+    def timed(self, name: str, **labels: str) -> Callable[[F], F]:
+        def decorator(func: F) -> F:
+            if inspect.iscoroutinefunction(func):
+
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await func(*args, **kwargs)
+                    start = time.perf_counter()
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        self.observe(name, time.perf_counter() - start, **labels)
+
+                return async_wrapper  # type: ignore
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start, **labels)
+
+            return wrapper  # type: ignore
+
+        return decorator
+
+    def snapshot(self) -> dict[str, Any]:
+        with self.lock:
+            return {
+                "counters": {
+                    name: [
+                        {"labels": dict(key), "value": value}
+                        for key, value in series.items()
+                    ]
+                    for name, series in self.counters.items()
+                },
+                "histograms": {
+                    name: [
+                        {
+                            "labels": dict(key),
+                            "buckets": dict(
+                                zip(
+                                    histogram.buckets + (float("inf"),),
+                                    histogram.cumulative(),
+                                )
+                            ),
+                            "sum": histogram.sum,
+                            "count": histogram.count,
+                        }
+                        for key, histogram in series.items()
+                    ]
+                    for name, series in self.histograms.items()
+                },
+            }
+
+    def render(self) -> str:
+        lines: list[str] = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                if name in self.descriptions:
+                    lines.append("# HELP {0} {1}".format(name, self.descriptions[name]))
+                lines.append("# TYPE {0} counter".format(name))
+                for key, value in series.items():
+                    lines.append(
+                        "{0}{1} {2}".format(
+                            name, _format_labels(key), _format_value(value)
+                        )
+                    )
+            for name, series in sorted(self.histograms.items()):
+                if name in self.descriptions:
+                    lines.append("# HELP {0} {1}".format(name, self.descriptions[name]))
+                lines.append("# TYPE {0} histogram".format(name))
+                for key, histogram in series.items():
+                    for bound, count in zip(
+                        histogram.buckets + (float("inf"),), histogram.cumulative()
+                    ):
+                        lines.append(
+                            "{0}_bucket{1} {2}".format(
+                                name,
+                                _format_labels(key, (("le", _format_value(bound)),)),
+                                count,
+                            )
+                        )
+                    lines.append(
+                        "{0}_sum{1} {2}".format(
+                            name, _format_labels(key), _format_value(histogram.sum)
+                        )
+                    )
+                    lines.append(
+                        "{0}_count{1} {2}".format(
+                            name, _format_labels(key), histogram.count
+                        )
+                    )
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    # a minimal HTTP endpoint for scrapers; every request gets the current metrics
+    async def serve(
+        self, host: str = "127.0.0.1", port: int = 9464
+    ) -> "asyncio.Server":
+        import asyncio
+
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            try:
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                body = self.render().encode()
+                writer.write(
+                    "HTTP/1.1 200 OK\r\nContent-Type: {0}\r\nContent-Length: {1}\r\n"
+                    "Connection: close\r\n\r\n".format(CONTENT_TYPE, len(body)).encode()
+                    + body
+                )
+                await writer.drain()
+            finally:
+                writer.close()
+
+        return await asyncio.start_server(handle, host, port)
+
+
+metrics = Metrics()
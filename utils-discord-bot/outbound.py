@@ -0,0 +1,228 @@
+import asyncio
+import enum
+import heapq
+import itertools
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Final, Optional
+
+# discord allows about 5 messages per 5 seconds per channel and 50 requests per
+# second per bot
+CHANNEL_RATE: Final[float] = 1.0
+CHANNEL_CAPACITY: Final[float] = 5.0
+GLOBAL_RATE: Final[float] = 50.0
+GLOBAL_CAPACITY: Final[float] = 50.0
+# absorbs float error so a bucket at 0.999... tokens does not wait forever
+TOKEN_EPSILON: Final[float] = 1e-9
+
+
+class Priority(enum.IntEnum):
+    INTERACTION = 0
+    USER = 1
+    BACKGROUND = 2
+
+
+# the key of the bucket a messageable's sends count against
+def channel_id(messageable: Any) -> int:
+    channel = getattr(messageable, "channel", messageable)
+    return getattr(channel, "id", id(channel))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float, now: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # seconds until a token is available
+    def delay(self, now: float) -> float:
+        self._refill(now)
+        if self.tokens >= 1 - TOKEN_EPSILON:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity - TOKEN_EPSILON
+
+
+@dataclass(order=True)
+class OutboundItem:
+    priority: int
+    sequence: int
+    send: Callable[[], Awaitable[Any]] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+# sends through per-channel and global token buckets, best priority first. Channels
+# whose bucket has a token wait in a heap ordered by their best item, the others in
+# a heap ordered by when their next token comes, so a send costs O(log channels)
+class OutboundScheduler:
+    def __init__(
+        self,
+        channel_rate: float = CHANNEL_RATE,
+        channel_capacity: float = CHANNEL_CAPACITY,
+        global_rate: float = GLOBAL_RATE,
+        global_capacity: float = GLOBAL_CAPACITY,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> None:
+        self.channel_rate = channel_rate
+        self.channel_capacity = channel_capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.global_bucket = TokenBucket(global_rate, global_capacity, clock())
+        self.buckets: dict[int, TokenBucket] = {}
+        self.queues: dict[int, list[OutboundItem]] = {}
+        # (priority, sequence, channel) of the head of each sendable channel, and
+        # (deadline, channel) of each channel waiting for a token; an entry that is no
+        # longer the channel's state in self.places is stale and skipped
+        self.ready: list[tuple[int, int, int]] = []
+        self.throttled: list[tuple[float, int]] = []
+        self.places: dict[int, tuple] = {}
+        # (refilled at, channel) of buckets that may be dropped once full
+        self.idle: list[tuple[float, int]] = []
+        self.counter = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.sending: set[asyncio.Task] = set()
+
+    def submit(
+        self,
+        channel_id: int,
+        send: Callable[[], Awaitable[Any]],
+        priority: Priority = Priority.BACKGROUND,
+    ) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        item = OutboundItem(
+            priority=priority, sequence=next(self.counter), send=send, future=future
+        )
+        heapq.heappush(self.queues.setdefault(channel_id, []), item)
+        place = self.places.get(channel_id)
+        if place is None:
+            self._place(channel_id, self.clock())
+        elif place[0] == "ready" and (item.priority, item.sequence) < place[1:]:
+            # the item jumps ahead of the head the channel was ready with
+            self._set_ready(channel_id, item)
+        self.wakeup.set()
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+        return future
+
+    def _bucket(self, channel_id: int, now: float) -> TokenBucket:
+        bucket = self.buckets.get(channel_id)
+        if bucket is None:
+            bucket = self.buckets[channel_id] = TokenBucket(
+                self.channel_rate, self.channel_capacity, now
+            )
+        return bucket
+
+    def _set_ready(self, channel_id: int, head: OutboundItem) -> None:
+        self.places[channel_id] = ("ready", head.priority, head.sequence)
+        heapq.heappush(self.ready, (head.priority, head.sequence, channel_id))
+
+    # puts a channel with queued items in the ready or the throttled heap, or forgets
+    # it once nothing but cancelled items is left
+    def _place(self, channel_id: int, now: float) -> None:
+        queue = self.queues[channel_id]
+        while queue and queue[0].future.cancelled():
+            heapq.heappop(queue)
+        if not queue:
+            del self.queues[channel_id]
+            self.places.pop(channel_id, None)
+            self._retire(channel_id, now)
+            return
+        delay = self._bucket(channel_id, now).delay(now)
+        if delay > 0:
+            self.places[channel_id] = ("throttled", now + delay)
+            heapq.heappush(self.throttled, (now + delay, channel_id))
+        else:
+            self._set_ready(channel_id, queue[0])
+
+    # a bucket with nothing queued is dropped once it refilled completely, since it
+    # holds no state worth keeping then
+    def _retire(self, channel_id: int, now: float) -> None:
+        bucket = self.buckets.get(channel_id)
+        if bucket is not None:
+            bucket._refill(now)
+            refilled = now + (bucket.capacity - bucket.tokens) / bucket.rate
+            heapq.heappush(self.idle, (refilled, channel_id))
+
+    def _prune(self, now: float) -> None:
+        while self.idle and self.idle[0][0] <= now:
+            _, channel_id = heapq.heappop(self.idle)
+            bucket = self.buckets.get(channel_id)
+            if (
+                bucket is not None
+                and channel_id not in self.queues
+                and bucket.is_full(now)
+            ):
+                del self.buckets[channel_id]
+
+    async def _wait(self, timeout: float) -> None:
+        waiters = {asyncio.ensure_future(self.wakeup.wait())}
+        if timeout != math.inf:
+            waiters.add(asyncio.ensure_future(self.sleep(timeout)))
+        try:
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+    async def _send(self, item: OutboundItem) -> None:
+        try:
+            result = await item.send()
+        except Exception as e:
+            if not item.future.done():
+                item.future.set_exception(e)
+        else:
+            if not item.future.done():
+                item.future.set_result(result)
+
+    async def _run(self) -> None:
+        while self.queues:
+            self.wakeup.clear()
+            now = self.clock()
+            self._prune(now)
+            while self.throttled and self.throttled[0][0] <= now:
+                deadline, channel_id = heapq.heappop(self.throttled)
+                if self.places.get(channel_id) == ("throttled", deadline):
+                    self._place(channel_id, now)
+            while self.ready:
+                priority, sequence, channel_id = self.ready[0]
+                if self.places.get(channel_id) == ("ready", priority, sequence):
+                    break
+                heapq.heappop(self.ready)
+
+            timeout = self.throttled[0][0] - now if self.throttled else math.inf
+            if not self.ready:
+                await self._wait(timeout)
+                continue
+            global_delay = self.global_bucket.delay(now)
+            if global_delay > 0:
+                await self._wait(min(timeout, global_delay))
+                continue
+
+            _, _, channel_id = heapq.heappop(self.ready)
+            del self.places[channel_id]
+            queue = self.queues[channel_id]
+            if queue[0].future.cancelled():
+                self._place(channel_id, now)
+                continue
+            item = heapq.heappop(queue)
+            self.global_bucket.take(now)
+            self._bucket(channel_id, now).take(now)
+            task = asyncio.create_task(self._send(item))
+            self.sending.add(task)
+            task.add_done_callback(self.sending.discard)
+            self._place(channel_id, now)
@@ -0,0 +1,265 @@
+import inspect
+import logging
+import re
+import secrets
+from typing import Any, Awaitable, Callable, Final, Optional, Union
+
+import discord
+
+from .metrics import metrics
+from .sessions import MemorySessionStore, SessionStore
+from .window import Window
+from .windows import PageSource
+
+logger = logging.getLogger(__name__)
+
+MAX_CUSTOM_ID_LENGTH: Final = 100
+PAGE_NUMBER_TIMEOUT: Final = 300
+
+KIND_PATTERN = re.compile(r"\w+")
+# pages:<kind>:<action>:<index>:<key>, where action is p(rev), n(ext) or j(ump)
+NAVIGATION_TEMPLATE = re.compile(
+    r"pages:(?P<kind>\w+):(?P<action>[pnj]):(?P<index>\d+):(?P<key>.*)", re.DOTALL
+)
+
+SourceFactory = Callable[[Any], Union[PageSource, Awaitable[PageSource]]]
+
+
+# a click on a paginator whose kind no PersistentPages registered in this process
+class UnknownKindError(Exception):
+    pass
+
+
+# a page with a view of its own, which could not survive a restart
+class PageViewError(ValueError):
+    pass
+
+
+# clicks carry only the kind, so each kind belongs to exactly one PersistentPages
+_owners: dict[str, "PersistentPages"] = {}
+
+
+def _owner(kind: str) -> "PersistentPages":
+    pages = _owners.get(kind)
+    if pages is None:
+        raise UnknownKindError(kind)
+    return pages
+
+
+# paginators whose whole state lives in the custom_id of their buttons; a click
+# rebuilds the page source from a registered factory, so nothing is kept per message
+# and the buttons keep working after a restart
+class PersistentPages:
+    class NavigationButton(
+        discord.ui.DynamicItem[discord.ui.Button], template=NAVIGATION_TEMPLATE
+    ):
+        def __init__(
+            self,
+            kind: str,
+            key: str,
+            action: str,
+            index: int,
+            label: Optional[str] = None,
+            disabled: bool = False,
+        ) -> None:
+            custom_id = "pages:{0}:{1}:{2}:{3}".format(kind, action, index, key)
+            if MAX_CUSTOM_ID_LENGTH < len(custom_id):
+                raise ValueError(custom_id)
+            super().__init__(
+                discord.ui.Button(label=label, disabled=disabled, custom_id=custom_id)
+            )
+            self.kind = kind
+            self.key = key
+            self.action = action
+            self.index = index
+
+        @classmethod
+        async def from_custom_id(
+            cls,
+            interaction: discord.Interaction,
+            item: discord.ui.Button,
+            match: re.Match[str],
+        ) -> "PersistentPages.NavigationButton":
+            return cls(
+                kind=match["kind"],
+                key=match["key"],
+                action=match["action"],
+                index=int(match["index"]),
+            )
+
+        async def callback(self, interaction: discord.Interaction) -> None:
+            if self.action == "j":
+                await interaction.response.send_modal(
+                    PersistentPages.PageNumberModal(kind=self.kind, key=self.key)
+                )
+                return
+            step = 1 if self.action == "n" else -1
+            await _owner(self.kind).move(
+                self.kind, self.key, self.index + step, interaction=interaction
+            )
+
+    # the modal only lives until it is submitted or times out
+    class PageNumberModal(discord.ui.Modal, title="ページ番号"):
+        page_input = discord.ui.TextInput(label="ページ番号")
+
+        def __init__(self, kind: str, key: str):
+            super().__init__(timeout=PAGE_NUMBER_TIMEOUT)
+            self.kind = kind
+            self.key = key
+
+        async def on_submit(self, interaction: discord.Interaction) -> None:
+            await _owner(self.kind).move(
+                self.kind,
+                self.key,
+                int(self.page_input.value) - 1,
+                interaction=interaction,
+            )
+
+    def __init__(self, sessions: Optional[SessionStore] = None) -> None:
+        self.factories: dict[str, SourceFactory] = {}
+        # kinds whose key names state in the session store instead of being the state
+        self.stored: set[str] = set()
+        self.sessions = MemorySessionStore() if sessions is None else sessions
+
+    # with stored, the factory gets the state saved by start instead of the key, for
+    # state that does not fit in a custom_id
+    # with replace, the kind is taken over from the PersistentPages that registered it,
+    # e.g. by a reloaded extension
+    def register(
+        self,
+        kind: str,
+        factory: SourceFactory,
+        stored: bool = False,
+        replace: bool = False,
+    ) -> None:
+        if KIND_PATTERN.fullmatch(kind) is None:
+            raise ValueError(kind)
+        owner = _owners.get(kind, self)
+        if owner is not self:
+            if not replace:
+                raise ValueError(
+                    "{0} is registered by another PersistentPages".format(kind)
+                )
+            owner.unregister(kind)
+        _owners[kind] = self
+        self.factories[kind] = factory
+        if stored:
+            self.stored.add(kind)
+        else:
+            self.stored.discard(kind)
+
+    # for an extension's teardown, so that its kind can be registered again
+    def unregister(self, kind: str) -> None:
+        if _owners.get(kind) is self:
+            del _owners[kind]
+        self.factories.pop(kind, None)
+        self.stored.discard(kind)
+
+    # must be called once with the bot so that clicks reach the navigation buttons;
+    # processes sharing a store can serve each other's stored paginators
+    def setup(
+        self, client: discord.Client, sessions: Optional[SessionStore] = None
+    ) -> None:
+        if sessions is not None:
+            self.sessions = sessions
+        client.add_dynamic_items(PersistentPages.NavigationButton)
+
+    # saves the state of a stored kind and returns the key to run or send it with
+    def start(self, kind: str, state: Any, ttl: Optional[float] = None) -> str:
+        if kind not in self.stored:
+            raise ValueError(kind)
+        key = secrets.token_urlsafe(12)
+        self.sessions.put("pages:{0}:{1}".format(kind, key), {"state": state}, ttl=ttl)
+        return key
+
+    async def _open(self, kind: str, key: str) -> PageSource:
+        if kind not in self.factories:
+            raise UnknownKindError(kind)
+        if kind in self.stored:
+            record = await self.sessions.get("pages:{0}:{1}".format(kind, key))
+            # expired or never saved
+            if record is None:
+                raise KeyError(key)
+            source = self.factories[kind](record["state"])
+        else:
+            source = self.factories[kind](key)
+        if inspect.isawaitable(source):
+            source = await source
+        return source
+
+    def _navigation(
+        self, kind: str, key: str, index: int, length: Optional[int]
+    ) -> discord.ui.View:
+        view = discord.ui.View(timeout=None)
+        view.add_item(
+            PersistentPages.NavigationButton(
+                kind, key, "p", index, label="<<", disabled=index <= 0
+            )
+        )
+        view.add_item(
+            PersistentPages.NavigationButton(
+                kind,
+                key,
+                "j",
+                index,
+                label="{0}/{1}".format(index + 1, "?" if length is None else length),
+            )
+        )
+        view.add_item(
+            PersistentPages.NavigationButton(
+                kind,
+                key,
+                "n",
+                index,
+                label=">>",
+                disabled=length is not None and length - 1 <= index,
+            )
+        )
+        # a finished view is sent as plain components and never enters the view store
+        view.stop()
+        return view
+
+    async def render(self, kind: str, key: str, index: int) -> Window:
+        source = await self._open(kind, key)
+        try:
+            length = source.length()
+            if index < 0 or (length is not None and length <= index):
+                raise IndexError
+            window = await source.get(index)
+        finally:
+            source.close()
+        if window.view is not None:
+            raise PageViewError(kind)
+        return window.copy(view=self._navigation(kind, key, index, length))
+
+    @metrics.timed("pages_seconds", operation="persistent_run")
+    async def run(
+        self, kind: str, key: str, interaction: discord.Interaction, index: int = 0
+    ) -> None:
+        window = await self.render(kind, key, index)
+        await window.response_send(interaction=interaction)
+
+    async def send(
+        self, kind: str, key: str, sender: discord.abc.Messageable, index: int = 0
+    ) -> discord.Message:
+        window = await self.render(kind, key, index)
+        return await window.send(sender)
+
+    @metrics.timed("pages_seconds", operation="persistent_move")
+    async def move(
+        self, kind: str, key: str, index: int, interaction: discord.Interaction
+    ) -> None:
+        try:
+            window = await self.render(kind, key, index)
+        # out of range, or stored state that is gone
+        except LookupError:
+            await interaction.response.defer()
+            return
+        except PageViewError:
+            logger.error("page %d of %s has a view of its own", index, kind)
+            await interaction.response.defer()
+            return
+        await window.response_edit(interaction=interaction)
+
+
+persistent_pages = PersistentPages()
@@ -0,0 +1,201 @@
+import asyncio
+import contextvars
+import cProfile
+import functools
+import io
+import os.path
+import pstats
+import re
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Coroutine, Final, Optional, TypeVar
+
+T = TypeVar("T")
+
+# how long callbacks of paginators started by a profiled command are still profiled
+# after the last profiled invocation finished
+FOLLOW_UP_SECONDS: Final[float] = 300.0
+
+# the profile that is enabled right now; cProfile cannot run two at once
+_enabled: Optional[cProfile.Profile] = None
+_current: contextvars.ContextVar[Optional["ProfileSession"]] = contextvars.ContextVar(
+    "profile_session", default=None
+)
+
+
+def current_session() -> Optional["ProfileSession"]:
+    return _current.get()
+
+
+# drives a coroutine and keeps the profile enabled only while the coroutine itself
+# runs, so other work on the event loop does not end up in the stats
+class _Profiled:
+    def __init__(self, coro: Coroutine[Any, Any, T], profile: cProfile.Profile):
+        self.coro = coro
+        self.profile = profile
+
+    def __await__(self):
+        global _enabled
+        value: Any = None
+        error: Optional[BaseException] = None
+        while True:
+            # nested profiled coroutines are attributed to the outermost one
+            owner = _enabled is None
+            if owner:
+                _enabled = self.profile
+                self.profile.enable()
+            try:
+                if error is None:
+                    future = self.coro.send(value)
+                else:
+                    future = self.coro.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                if owner:
+                    self.profile.disable()
+                    _enabled = None
+            try:
+                value = yield future
+                error = None
+            except GeneratorExit:
+                self.coro.close()
+                raise
+            except BaseException as e:
+                value = None
+                error = e
+
+
+class ProfileSession:
+    def __init__(
+        self, name: str, count: int, path: str, follow_up: float = FOLLOW_UP_SECONDS
+    ) -> None:
+        self.name = name
+        self.path = path
+        self.follow_up = follow_up
+        self.profile = cProfile.Profile()
+        # invocations that may still start, and those running now
+        self.remaining = count
+        self.running = 0
+        self.invocations = 0
+        self.finished_at: Optional[float] = None
+        self.done: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+
+    @property
+    def following(self) -> bool:
+        return self.finished_at is None or (
+            time.monotonic() - self.finished_at <= self.follow_up
+        )
+
+    async def invoke(self, coro: Coroutine[Any, Any, T]) -> T:
+        self.remaining -= 1
+        self.running += 1
+        self.invocations += 1
+        token = _current.set(self)
+        try:
+            return await _Profiled(coro, self.profile)
+        finally:
+            _current.reset(token)
+            self.running -= 1
+            if self.remaining <= 0 and self.running == 0:
+                self.finish()
+            else:
+                self.dump()
+
+    def finish(self) -> None:
+        self.finished_at = time.monotonic()
+        self.dump()
+        if not self.done.done():
+            self.done.set_result(self.path)
+
+    # work started by a profiled invocation but run later, like button callbacks
+    async def follow(self, coro: Coroutine[Any, Any, T]) -> T:
+        if not self.following:
+            return await coro
+        try:
+            return await _Profiled(coro, self.profile)
+        finally:
+            self.dump()
+
+    def dump(self) -> None:
+        self.profile.dump_stats(self.path)
+
+    def report(self, sort: str = "cumulative", limit: int = 30) -> str:
+        output = io.StringIO()
+        pstats.Stats(self.profile, stream=output).sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+    async def wait(self) -> str:
+        return await asyncio.shield(self.done)
+
+
+# profiles the next invocations of commands by name; a command that is not armed
+# costs one dict lookup
+class Profiler:
+    def __init__(self, directory: Optional[str] = None) -> None:
+        self.directory = tempfile.gettempdir() if directory is None else directory
+        self.sessions: dict[str, ProfileSession] = {}
+
+    def arm(
+        self,
+        name: str,
+        count: int = 1,
+        path: Optional[str] = None,
+        follow_up: float = FOLLOW_UP_SECONDS,
+    ) -> ProfileSession:
+        if count <= 0:
+            raise ValueError(count)
+        if path is None:
+            path = os.path.join(
+                self.directory,
+                "{0}-{1}.prof".format(
+                    re.sub(r"\W+", "_", name), time.strftime("%Y%m%d-%H%M%S")
+                ),
+            )
+        session = ProfileSession(name, count, path, follow_up=follow_up)
+        self.sessions[name] = session
+        return session
+
+    # stops profiling new invocations; the session finishes when running ones do
+    def disarm(self, name: str) -> Optional[ProfileSession]:
+        session = self.sessions.pop(name, None)
+        if session is not None:
+            session.remaining = 0
+            if session.running == 0:
+                session.finish()
+        return session
+
+    def is_armed(self, name: str) -> bool:
+        return name in self.sessions
+
+    async def run(self, name: str, coro: Coroutine[Any, Any, T]) -> T:
+        session = self.sessions.get(name)
+        if session is None:
+            return await coro
+        if session.remaining <= 1:
+            del self.sessions[name]
+        return await session.invoke(coro)
+
+    def wrap(
+        self, name: str, callback: Callable[..., Awaitable[T]]
+    ) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(callback)
+        async def wrapper(*args, **kwargs) -> T:
+            if name not in self.sessions:
+                return await callback(*args, **kwargs)
+            return await self.run(name, callback(*args, **kwargs))
+
+        wrapper.__profiled__ = True
+        return wrapper
+
+
+# for methods of objects that remember the session they were created in
+def followed(func: Callable[..., Coroutine[Any, Any, T]]):
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs) -> T:
+        session: Optional[ProfileSession] = self.profile_session
+        if session is None:
+            return await func(self, *args, **kwargs)
+        return await session.follow(func(self, *args, **kwargs))
+
+    return wrapper
@@ -0,0 +1,105 @@
+import asyncio
+import inspect
+import logging
+from typing import Awaitable, Callable, Final, Iterable, Union
+
+import discord
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# reactions on one channel share a rate limit of about 1 request per 0.25 seconds
+REACTION_INTERVAL: Final[float] = 0.25
+
+metrics.describe(
+    "reaction_seconds", "Time spent adding one reaction, rate limit wait included."
+)
+
+Emoji = Union[discord.Emoji, discord.Reaction, discord.PartialEmoji, str]
+MessageTarget = Union[discord.Message, Callable[[], Awaitable[discord.Message]]]
+
+
+def _emoji_key(emoji: Emoji) -> str:
+    if isinstance(emoji, discord.Reaction):
+        emoji = emoji.emoji
+    return str(emoji)
+
+
+class RateLimiter:
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.lock = asyncio.Lock()
+        self.next_time = 0.0
+        self.users = 0
+
+    async def wait(self) -> None:
+        async with self.lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            if self.next_time > now:
+                await asyncio.sleep(self.next_time - now)
+                now = loop.time()
+            self.next_time = now + self.interval
+
+
+# adds reactions in the background, one channel at a time per rate limit
+class ReactionPipeline:
+    def __init__(self, interval: float = REACTION_INTERVAL) -> None:
+        self.interval = interval
+        self.limiters: dict[int, RateLimiter] = {}
+        self.tasks: set[asyncio.Task] = set()
+
+    def add(
+        self,
+        target: MessageTarget,
+        emojis: Iterable[Emoji],
+        skip_existing: bool = False,
+    ) -> asyncio.Task:
+        task = asyncio.create_task(self._run(target, list(emojis), skip_existing))
+        self.tasks.add(task)
+        task.add_done_callback(self._done)
+        return task
+
+    def _done(self, task: asyncio.Task) -> None:
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            metrics.increment("reaction_failures_total")
+            logger.error("failed to add reactions", exc_info=task.exception())
+
+    async def _run(
+        self, target: MessageTarget, emojis: list[Emoji], skip_existing: bool
+    ) -> None:
+        message = await target() if inspect.iscoroutinefunction(target) else target
+        if skip_existing:
+            existing = {
+                _emoji_key(reaction.emoji)
+                for reaction in message.reactions
+                if reaction.me
+            }
+            emojis = [emoji for emoji in emojis if _emoji_key(emoji) not in existing]
+        if len(emojis) == 0:
+            return
+
+        channel_id = message.channel.id
+        limiter = self.limiters.get(channel_id)
+        if limiter is None:
+            limiter = self.limiters[channel_id] = RateLimiter(self.interval)
+        limiter.users += 1
+        try:
+            for emoji in emojis:
+                with metrics.timer("reaction_seconds"):
+                    await limiter.wait()
+                    await message.add_reaction(emoji)
+        finally:
+            limiter.users -= 1
+            if limiter.users == 0:
+                del self.limiters[channel_id]
+
+    # waits until every queued reaction has been added
+    async def drain(self) -> None:
+        while self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+reaction_pipeline = ReactionPipeline()
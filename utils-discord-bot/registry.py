@@ -0,0 +1,117 @@
+import time
+from typing import TYPE_CHECKING, Any, Iterator, NamedTuple, Optional
+
+from .metrics import LIFETIME_BUCKETS, metrics
+from .runner import IRunner
+
+if TYPE_CHECKING:
+    import discord
+
+metrics.describe(
+    "runner_lifetime_seconds",
+    "Time from registering a runner to removing it.",
+    buckets=LIFETIME_BUCKETS,
+)
+
+
+# live runners indexed by channel, user and message for O(1) lookups
+class RunnerRegistry:
+    class Route(NamedTuple):
+        runner: IRunner
+        # the Window, Pages or runner that owns the message
+        target: Any
+
+    def __init__(self) -> None:
+        self.keys: dict[IRunner, tuple[int, Optional[int], set[int]]] = {}
+        self.by_channel: dict[int, set[IRunner]] = {}
+        self.by_user: dict[int, set[IRunner]] = {}
+        self.by_message: dict[int, RunnerRegistry.Route] = {}
+        self.added: dict[IRunner, float] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, runner: IRunner) -> bool:
+        return runner in self.keys
+
+    def __iter__(self) -> Iterator[IRunner]:
+        return iter(list(self.keys))
+
+    def add(self, runner: IRunner, channel_id: int, user_id: Optional[int] = None):
+        if runner in self.keys:
+            self.remove(runner)
+        self.keys[runner] = (channel_id, user_id, set())
+        self.added[runner] = time.monotonic()
+        metrics.increment("runners_started_total", runner=type(runner).__name__)
+        self.by_channel.setdefault(channel_id, set()).add(runner)
+        if user_id is not None:
+            self.by_user.setdefault(user_id, set()).add(runner)
+
+    def bind_message(self, runner: IRunner, message_id: int, target: Any = None):
+        # a message moves to the new runner and is no longer the old one's to remove
+        previous = self.by_message.get(message_id)
+        if previous is not None and previous.runner in self.keys:
+            self.keys[previous.runner][2].discard(message_id)
+        self.keys[runner][2].add(message_id)
+        self.by_message[message_id] = RunnerRegistry.Route(
+            runner=runner, target=runner if target is None else target
+        )
+
+    def unbind_message(self, message_id: int):
+        route = self.by_message.pop(message_id, None)
+        if route is not None and route.runner in self.keys:
+            self.keys[route.runner][2].discard(message_id)
+
+    @staticmethod
+    def _discard(index: dict[int, set[IRunner]], key: int, runner: IRunner):
+        runners = index.get(key)
+        if runners is not None:
+            runners.discard(runner)
+            if len(runners) == 0:
+                del index[key]
+
+    def remove(self, runner: IRunner):
+        keys = self.keys.pop(runner, None)
+        if keys is None:
+            return
+        channel_id, user_id, message_ids = keys
+        metrics.observe(
+            "runner_lifetime_seconds",
+            time.monotonic() - self.added.pop(runner),
+            runner=type(runner).__name__,
+        )
+        RunnerRegistry._discard(self.by_channel, channel_id, runner)
+        if user_id is not None:
+            RunnerRegistry._discard(self.by_user, user_id, runner)
+        for message_id in message_ids:
+            route = self.by_message.get(message_id)
+            if route is not None and route.runner is runner:
+                del self.by_message[message_id]
+
+    def in_channel(self, channel_id: int) -> frozenset[IRunner]:
+        return frozenset(self.by_channel.get(channel_id, ()))
+
+    def of_user(self, user_id: int) -> frozenset[IRunner]:
+        return frozenset(self.by_user.get(user_id, ()))
+
+    # whether the user (in the channel) or, without a user, the channel has a runner
+    def has_active(self, channel_id: int, user_id: Optional[int] = None) -> bool:
+        if user_id is None:
+            return channel_id in self.by_channel
+        return any(
+            self.keys[runner][0] == channel_id
+            for runner in self.by_user.get(user_id, ())
+        )
+
+    def route(self, message_id: int) -> Optional[Route]:
+        return self.by_message.get(message_id)
+
+    def route_interaction(self, interaction: "discord.Interaction") -> Optional[Route]:
+        if interaction.message is None:
+            return None
+        return self.route(interaction.message.id)
+
+    def route_reaction(
+        self, payload: "discord.RawReactionActionEvent"
+    ) -> Optional[Route]:
+        return self.route(payload.message_id)
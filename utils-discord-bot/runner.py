@@ -1,9 +1,13 @@
 import abc
-import discord
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    import discord
+    from .scheduler import ExpiryScheduler
 
 class IRunner(metaclass=abc.ABCMeta):
     @abc.abstractmethod
-    async def run(self, interaction: discord.Interaction):
+    async def run(self, interaction: "discord.Interaction"):
         raise NotImplementedError
 
     @abc.abstractmethod
@@ -12,14 +16,49 @@ class IRunner(metaclass=abc.ABCMeta):
 
 
 class Runner(IRunner):
-    def __init__(self, channel: discord.TextChannel, timeout: float = None):
+    def __init__(
+        self,
+        channel: "discord.TextChannel",
+        timeout: float = None,
+        user: Optional["discord.abc.User"] = None,
+    ):
         self.channel = channel
         self.timeout = timeout
+        self.user = user
+        self.scheduler: Optional["ExpiryScheduler"] = None
+        # set by the cog; names the runner in a session store shared with other processes
+        self.session_key: Optional[str] = None
+
+    def attach_scheduler(self, scheduler: "ExpiryScheduler"):
+        self.scheduler = scheduler
+        self.touch()
+
+    # pushes the deadline back to timeout minutes from now
+    def touch(self):
+        if self.scheduler is not None and self.timeout is not None:
+            self.scheduler.schedule(self, self.timeout * 60)
+
+    # called for reactions added to a message bound to this runner in the registry
+    async def on_reaction(self, payload: "discord.RawReactionActionEvent", target):
+        pass
+
+    # JSON-serializable state from which from_session rebuilds the runner in another
+    # process; None keeps the runner local to this process
+    def session_state(self) -> Optional[dict[str, Any]]:
+        return None
+
+    @classmethod
+    def from_session(
+        cls,
+        channel: "discord.abc.Messageable",
+        user: Optional["discord.abc.User"],
+        timeout: Optional[float],
+        state: dict[str, Any],
+    ) -> "Runner":
+        raise NotImplementedError
 
-    async def timeout_check(self, minutes: float) -> bool:
-        self.timeout -= minutes
-        if self.timeout <= 0:
-            await self.destroy()
-            return True
-        else:
-            return False
\ No newline at end of file
+    # called for each interaction or reaction that made this process take the runner
+    # over from the session store, including ones that came in while it was taken
+    # over; views of the original process are not here, so the runner handles them
+    async def on_resume(self, interaction: Optional["discord.Interaction"], target):
+        pass
\ No newline at end of file
@@ -0,0 +1,95 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional
+
+if TYPE_CHECKING:
+    from .runner import IRunner
+
+logger = logging.getLogger(__name__)
+
+
+# destroys runners when their deadline passes, earliest first
+class ExpiryScheduler:
+    def __init__(
+        self,
+        on_expire: Optional[Callable[["IRunner"], None]] = None,
+        should_destroy: Optional[Callable[["IRunner"], Awaitable[bool]]] = None,
+    ) -> None:
+        self.on_expire = on_expire
+        # asked right before destroying; False only drops the runner, e.g. because
+        # another process has taken it over
+        self.should_destroy = should_destroy
+        # (deadline, sequence, runner); entries whose sequence is no longer the
+        # runner's current one were refreshed or cancelled and are skipped
+        self.heap: list[tuple[float, int, "IRunner"]] = []
+        self.sequences: dict["IRunner", int] = {}
+        self.counter = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.expiring: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self.sequences)
+
+    def __contains__(self, runner: "IRunner") -> bool:
+        return runner in self.sequences
+
+    # (re)sets the runner's deadline to delay seconds from now in O(log n)
+    def schedule(self, runner: "IRunner", delay: float) -> None:
+        sequence = next(self.counter)
+        deadline = time.monotonic() + delay
+        self.sequences[runner] = sequence
+        heapq.heappush(self.heap, (deadline, sequence, runner))
+        if len(self.heap) > 2 * len(self.sequences) + 64:
+            self._compact()
+        if self.heap[0][1] == sequence:
+            self.wakeup.set()
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    def cancel(self, runner: "IRunner") -> None:
+        self.sequences.pop(runner, None)
+
+    def _compact(self) -> None:
+        self.heap = [
+            entry for entry in self.heap if self.sequences.get(entry[2]) == entry[1]
+        ]
+        heapq.heapify(self.heap)
+
+    async def _run(self) -> None:
+        while True:
+            while self.heap and self.sequences.get(self.heap[0][2]) != self.heap[0][1]:
+                heapq.heappop(self.heap)
+            self.wakeup.clear()
+            if not self.heap:
+                await self.wakeup.wait()
+                continue
+            delay = self.heap[0][0] - time.monotonic()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, runner = heapq.heappop(self.heap)
+            del self.sequences[runner]
+            task = asyncio.create_task(self._expire(runner))
+            self.expiring.add(task)
+            task.add_done_callback(self.expiring.discard)
+
+    async def _expire(self, runner: "IRunner") -> None:
+        try:
+            if self.should_destroy is None or await self.should_destroy(runner):
+                await runner.destroy()
+        except Exception:
+            logger.exception("failed to destroy an expired runner")
+        if self.on_expire is not None:
+            self.on_expire(runner)
+
+    def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
@@ -0,0 +1,246 @@
+import abc
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Final, Iterable, Mapping, Optional
+
+FLUSH_INTERVAL: Final[float] = 0.05
+MAX_BATCH: Final[int] = 256
+CACHE_SIZE: Final[int] = 1024
+# how stale a cached read may be before another process's write becomes visible
+CACHE_TTL: Final[float] = 1.0
+BUSY_TIMEOUT_MS: Final[int] = 5000
+
+State = dict[str, Any]
+
+
+# where runner and paginator state lives, so that any process can pick a session up;
+# writes are buffered and become visible to other processes after flush()
+class SessionStore(metaclass=abc.ABCMeta):
+    @abc.abstractmethod
+    async def get(self, key: str) -> Optional[State]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def put(self, key: str, state: Mapping[str, Any], ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    # makes the next get read what other processes have written, past any cache
+    def invalidate(self, key: str) -> None:
+        pass
+
+    async def flush(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    def __init__(self) -> None:
+        # key -> (state, expiry)
+        self.states: dict[str, tuple[State, Optional[float]]] = {}
+
+    async def get(self, key: str) -> Optional[State]:
+        entry = self.states.get(key)
+        if entry is None:
+            return None
+        state, expires = entry
+        if expires is not None and expires <= time.time():
+            del self.states[key]
+            return None
+        # copies keep callers from changing the stored state in place, as with sqlite
+        return json.loads(json.dumps(state))
+
+    def put(self, key: str, state: Mapping[str, Any], ttl: Optional[float] = None):
+        self.states[key] = (
+            json.loads(json.dumps(state)),
+            None if ttl is None else time.time() + ttl,
+        )
+
+    def delete(self, key: str):
+        self.states.pop(key, None)
+
+
+# a local SQLite database in WAL mode shared by the processes on one machine.
+# Writes are queued and committed together in one transaction, and reads go
+# through a small LRU cache whose entries are trusted for cache_ttl seconds.
+class SQLiteSessionStore(SessionStore):
+    def __init__(
+        self,
+        path: str,
+        flush_interval: float = FLUSH_INTERVAL,
+        max_batch: int = MAX_BATCH,
+        cache_size: int = CACHE_SIZE,
+        cache_ttl: float = CACHE_TTL,
+    ) -> None:
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        # one thread owns the connection, so the event loop never waits on sqlite
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.connection: Optional[sqlite3.Connection] = None
+        self.connection_lock = threading.Lock()
+        # key -> (serialized state or None for a delete, expiry)
+        self.pending: dict[str, tuple[Optional[str], Optional[float]]] = {}
+        self.flushing: Optional[asyncio.Task] = None
+        self.flush_lock = asyncio.Lock()
+        # set when a full batch should not wait for the interval
+        self.full = asyncio.Event()
+        # key -> (state or None, read at, expiry)
+        self.cache: OrderedDict[str, tuple[Optional[State], float, Optional[float]]] = (
+            OrderedDict()
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        with self.connection_lock:
+            if self.connection is None:
+                connection = sqlite3.connect(
+                    self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None
+                )
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS sessions ("
+                    "key TEXT PRIMARY KEY, state TEXT NOT NULL, expires REAL)"
+                )
+                self.connection = connection
+            return self.connection
+
+    def _read(self, key: str) -> tuple[Optional[str], Optional[float]]:
+        row = (
+            self._connect()
+            .execute(
+                "SELECT state, expires FROM sessions WHERE key = ? "
+                "AND (expires IS NULL OR expires > ?)",
+                (key, time.time()),
+            )
+            .fetchone()
+        )
+        return (None, None) if row is None else (row[0], row[1])
+
+    def _write(
+        self, batch: Iterable[tuple[str, tuple[Optional[str], Optional[float]]]]
+    ) -> None:
+        connection = self._connect()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for key, (data, expires) in batch:
+                if data is None:
+                    connection.execute("DELETE FROM sessions WHERE key = ?", (key,))
+                else:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO sessions (key, state, expires) "
+                        "VALUES (?, ?, ?)",
+                        (key, data, expires),
+                    )
+            connection.execute(
+                "DELETE FROM sessions WHERE expires IS NOT NULL AND expires <= ?",
+                (now,),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _cache(
+        self, key: str, state: Optional[State], expires: Optional[float]
+    ) -> None:
+        if self.cache_size <= 0:
+            return
+        self.cache[key] = (state, time.monotonic(), expires)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[State]:
+        # this process's own queued writes win over everything else
+        pending = self.pending.get(key)
+        if pending is not None:
+            data, expires = pending
+            if data is None or (expires is not None and expires <= time.time()):
+                return None
+            return json.loads(data)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            state, read_at, expires = cached
+            if time.monotonic() - read_at <= self.cache_ttl and (
+                expires is None or expires > time.time()
+            ):
+                self.cache.move_to_end(key)
+                return None if state is None else json.loads(json.dumps(state))
+            del self.cache[key]
+
+        loop = asyncio.get_running_loop()
+        data, expires = await loop.run_in_executor(self.executor, self._read, key)
+        state = None if data is None else json.loads(data)
+        # a write queued while reading is newer than what was read
+        if key not in self.pending:
+            self._cache(key, state, expires)
+        return None if state is None else json.loads(json.dumps(state))
+
+    def _queue(self, key: str, data: Optional[str], expires: Optional[float]) -> None:
+        self.pending[key] = (data, expires)
+        self.cache.pop(key, None)
+        if len(self.pending) >= self.max_batch:
+            self.full.set()
+        if self.flushing is None or self.flushing.done():
+            self.flushing = asyncio.ensure_future(self._flush_later())
+
+    def invalidate(self, key: str) -> None:
+        self.cache.pop(key, None)
+
+    def put(self, key: str, state: Mapping[str, Any], ttl: Optional[float] = None):
+        self._queue(key, json.dumps(state), None if ttl is None else time.time() + ttl)
+
+    def delete(self, key: str):
+        self._queue(key, None, None)
+
+    # batches whatever was queued within flush_interval, until nothing is left
+    async def _flush_later(self) -> None:
+        while self.pending:
+            try:
+                await asyncio.wait_for(self.full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.full.clear()
+            await self.flush()
+
+    # commits every queued write in one transaction
+    async def flush(self) -> None:
+        async with self.flush_lock:
+            if not self.pending:
+                return
+            batch = list(self.pending.items())
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, self._write, batch)
+            for key, entry in batch:
+                # only drop what was not queued again while writing
+                if self.pending.get(key) is entry:
+                    del self.pending[key]
+
+    async def close(self) -> None:
+        if self.flushing is not None:
+            self.flushing.cancel()
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._disconnect)
+        self.executor.shutdown(wait=True)
+
+    def _disconnect(self) -> None:
+        with self.connection_lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
@@ -0,0 +1,182 @@
+import asyncio
+import datetime
+import logging
+import time
+from dataclasses import dataclass
+from typing import Final, Iterable, Optional, Union
+
+import discord
+
+from .attachments import forget_message
+
+logger = logging.getLogger(__name__)
+
+# discord only bulk deletes 2 to 100 messages younger than 14 days
+BULK_DELETE_LIMIT: Final[int] = 100
+BULK_DELETE_MAX_AGE: Final[datetime.timedelta] = datetime.timedelta(days=14)
+# leaves room for the time between collecting and sending the request
+BULK_DELETE_MARGIN: Final[datetime.timedelta] = datetime.timedelta(minutes=1)
+
+
+@dataclass(frozen=True)
+class TeardownReport:
+    messages: int
+    channels: int
+    bulk_deleted: int
+    single_deleted: int
+    failed: int
+    seconds: float
+
+
+# deletes expired messages together, grouped by channel
+class TeardownService:
+    def __init__(self, delay: float = 1.0, concurrency: int = 5) -> None:
+        self.delay = delay
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.pending: list[tuple[discord.Message, asyncio.Future]] = []
+        self.flush_task: Optional[asyncio.Task] = None
+        self.last_report: Optional[TeardownReport] = None
+
+    # queues the message and resolves once the batch it ended up in is deleted, or
+    # raises what kept this message from being deleted
+    def delete(self, message: discord.Message) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((message, future))
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self._flush_later())
+        return future
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.delay)
+        pending, self.pending = self.pending, []
+        try:
+            _, errors = await self._teardown(message for message, _ in pending)
+        except BaseException as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            raise
+        for message, future in pending:
+            if future.done():
+                continue
+            error = errors.get(id(message))
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+
+    @staticmethod
+    def _can_bulk_delete(channel: discord.abc.Messageable) -> bool:
+        if not hasattr(channel, "delete_messages"):
+            return False
+        guild = getattr(channel, "guild", None)
+        if guild is None or guild.me is None:
+            return False
+        return channel.permissions_for(guild.me).manage_messages
+
+    async def _delete_one(self, message: discord.Message) -> Optional[Exception]:
+        async with self.semaphore:
+            try:
+                await message.delete()
+            except discord.NotFound:
+                pass
+            except discord.HTTPException as e:
+                logger.exception("failed to delete message %s", message.id)
+                return e
+        return None
+
+    # returns the bulk and single deletions, and the errors by id() of the message
+    async def _delete_channel(
+        self, channel: discord.abc.Messageable, messages: list[discord.Message]
+    ) -> tuple[int, int, dict[int, Exception]]:
+        bulk_deleted = 0
+        singles: list[discord.Message] = []
+        if self._can_bulk_delete(channel):
+            oldest = discord.utils.utcnow() - BULK_DELETE_MAX_AGE + BULK_DELETE_MARGIN
+            young = [message for message in messages if message.created_at > oldest]
+            singles = [message for message in messages if message.created_at <= oldest]
+            for start in range(0, len(young), BULK_DELETE_LIMIT):
+                chunk = young[start : start + BULK_DELETE_LIMIT]
+                if len(chunk) < 2:
+                    singles.extend(chunk)
+                    continue
+                try:
+                    async with self.semaphore:
+                        await channel.delete_messages(chunk)
+                    bulk_deleted += len(chunk)
+                except discord.HTTPException:
+                    singles.extend(chunk)
+        else:
+            singles = messages
+        results = await asyncio.gather(*(self._delete_one(m) for m in singles))
+        errors = {
+            id(message): error
+            for message, error in zip(singles, results)
+            if error is not None
+        }
+        return bulk_deleted, len(singles) - len(errors), errors
+
+    async def teardown(self, messages: Iterable[discord.Message]) -> TeardownReport:
+        report, _ = await self._teardown(messages)
+        return report
+
+    # a message or channel that fails only fails itself, never the rest of the batch
+    async def _teardown(
+        self, messages: Iterable[discord.Message]
+    ) -> tuple[TeardownReport, dict[int, Exception]]:
+        start = time.perf_counter()
+        channels: dict[int, tuple[discord.abc.Messageable, list[discord.Message]]] = {}
+        errors: dict[int, Exception] = {}
+        count = 0
+        for message in messages:
+            count += 1
+            try:
+                channel = message.channel
+                channel_id = channel.id
+            except AttributeError as e:
+                logger.error("cannot delete %r, it is not a message", message)
+                errors[id(message)] = e
+                continue
+            channels.setdefault(channel_id, (channel, []))[1].append(message)
+        results: list[Union[tuple[int, int, dict[int, Exception]], Exception]] = (
+            await asyncio.gather(
+                *(
+                    self._delete_channel(channel, channel_messages)
+                    for channel, channel_messages in channels.values()
+                ),
+                return_exceptions=True,
+            )
+        )
+        bulk_deleted = 0
+        single_deleted = 0
+        for (channel, channel_messages), result in zip(channels.values(), results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, Exception):
+                    raise result
+                logger.error(
+                    "failed to tear down channel %s",
+                    getattr(channel, "id", None),
+                    exc_info=result,
+                )
+                errors.update((id(message), result) for message in channel_messages)
+                continue
+            bulk_deleted += result[0]
+            single_deleted += result[1]
+            errors.update(result[2])
+            for message in channel_messages:
+                if id(message) not in result[2]:
+                    forget_message(message.id)
+        report = TeardownReport(
+            messages=count,
+            channels=len(channels),
+            bulk_deleted=bulk_deleted,
+            single_deleted=single_deleted,
+            failed=len(errors),
+            seconds=time.perf_counter() - start,
+        )
+        self.last_report = report
+        logger.info("teardown finished: %s", report)
+        return report, errors
+
+
+teardown_service = TeardownService()
@@ -0,0 +1,73 @@
+from typing import Any, Generic, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Trie(Generic[T]):
+    class Node:
+        __slots__ = ("children", "value", "has_value")
+
+        def __init__(self) -> None:
+            self.children: dict[str, Trie.Node] = {}
+            self.value: Any = None
+            self.has_value = False
+
+    def __init__(self) -> None:
+        self.root = Trie.Node()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, key: str) -> bool:
+        node = self._find(key)
+        return node is not None and node.has_value
+
+    def _find(self, key: str) -> Optional[Node]:
+        node = self.root
+        for char in key:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def insert(self, key: str, value: T) -> None:
+        node = self.root
+        for char in key:
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = Trie.Node()
+            node = child
+        if not node.has_value:
+            self.size += 1
+        node.value = value
+        node.has_value = True
+
+    def get(self, key: str, default: Optional[T] = None) -> Optional[T]:
+        node = self._find(key)
+        if node is None or not node.has_value:
+            return default
+        return node.value
+
+    # every key that text starts with (from start), shortest first; the walk stops
+    # at the first character that leaves the trie, so it is bounded by the longest key
+    def prefixes(self, text: str, start: int = 0) -> Iterator[tuple[int, T]]:
+        node = self.root
+        for index in range(start, len(text)):
+            node = node.children.get(text[index])
+            if node is None:
+                return
+            if node.has_value:
+                yield index + 1, node.value
+
+    def items(self, prefix: str = "") -> Iterator[tuple[str, T]]:
+        node = self._find(prefix)
+        if node is None:
+            return
+        stack = [(prefix, node)]
+        while stack:
+            key, node = stack.pop()
+            if node.has_value:
+                yield key, node.value
+            for char in sorted(node.children, reverse=True):
+                stack.append((key + char, node.children[char]))
@@ -1,13 +1,29 @@
 import abc
+import asyncio
 import discord
-from typing import Optional, Union, Sequence, Any
+from typing import Optional, Union, Sequence, Any, Final
+
+from .attachments import StoredAttachment, forget_message
+from .metrics import metrics
+from .outbound import OutboundScheduler, Priority, channel_id
+from .reactions import MessageTarget, reaction_pipeline
 
 class UnSetType:
     pass
 
 UnSet = UnSetType()
 
+# limits of a single message
+MAX_CONTENT_LENGTH: Final[int] = 2000
+MAX_EMBEDS: Final[int] = 10
+MAX_EMBEDS_LENGTH: Final[int] = 6000
+MAX_FILES: Final[int] = 10
+
+metrics.describe("window_seconds", "Time spent sending or editing a window.")
+
 class IWindow(metaclass=abc.ABCMeta):
+    __slots__ = ()
+
     @abc.abstractmethod
     async def send(self, sender: discord.abc.Messageable) -> discord.Message:
         raise NotImplementedError
@@ -30,14 +46,38 @@ class IWindow(metaclass=abc.ABCMeta):
 
 
 class Window(IWindow):
+    FIELDS: Final[tuple[str, ...]] = (
+        "content",
+        "tts",
+        "embed",
+        "embeds",
+        "file",
+        "files",
+        "stickers",
+        "delete_after",
+        "nonce",
+        "allowed_mentions",
+        "reference",
+        "mention_author",
+        "view",
+        "suppress_embeds",
+        "silent",
+        "ephemeral",
+        "emojis",
+    )
+    # fields that do not appear in any send/edit kwargs
+    KWARGS_FREE_FIELDS: Final[frozenset[str]] = frozenset({"emojis"})
+
+    __slots__ = FIELDS + ("_kwargs",)
+
     def __init__(
         self,
         content: Optional[str] = None,
         tts: bool = False,
         embed: Optional[discord.Embed] = None,
         embeds: Optional[list[discord.Embed]] = None,
-        file: Optional[discord.File] = None,
-        files: Optional[list[discord.File]] = None,
+        file: Union[discord.File, StoredAttachment, None] = None,
+        files: Optional[list[Union[discord.File, StoredAttachment]]] = None,
         stickers: Optional[
             Sequence[Union[discord.GuildSticker, discord.StickerItem]]
         ] = None,
@@ -56,86 +96,132 @@ class Window(IWindow):
             list[Union[discord.Emoji, discord.Reaction, discord.PartialEmoji, str]]
         ] = None,
     ) -> None:
-        self.content = content
-        self.tts = tts
-        self.embed = embed
-        self.embeds = embeds
-        self.file = file
-        self.files = files
-        self.stickers = stickers
-        self.delete_after = delete_after
-        self.nonce = nonce
-        self.allowed_mentions = allowed_mentions
-        self.reference = reference
-        self.mention_author = mention_author
-        self.view = view
-        self.suppress_embeds = suppress_embeds
-        self.silent = silent
-        self.emojis = emojis
-        self.ephemeral = ephemeral
-        self.args_messageable_send: dict[str, Any] = {
-            "tts": tts,
-            "suppress_embeds": suppress_embeds,
-            "silent": silent,
+        for name, value in (
+            ("content", content),
+            ("tts", tts),
+            ("embed", embed),
+            ("embeds", embeds),
+            ("file", file),
+            ("files", files),
+            ("stickers", stickers),
+            ("delete_after", delete_after),
+            ("nonce", nonce),
+            ("allowed_mentions", allowed_mentions),
+            ("reference", reference),
+            ("mention_author", mention_author),
+            ("view", view),
+            ("suppress_embeds", suppress_embeds),
+            ("silent", silent),
+            ("ephemeral", ephemeral),
+            ("emojis", emojis),
+        ):
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, "_kwargs", None)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("Window is immutable, use copy() instead")
+
+    # copy, deepcopy and pickle rebuild the window from its fields; the built kwargs
+    # are left out and built again on first use
+    def __reduce__(self) -> tuple:
+        return type(self), (), {name: getattr(self, name) for name in Window.FIELDS}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        for name in Window.FIELDS:
+            object.__setattr__(self, name, state[name])
+        object.__setattr__(self, "_kwargs", None)
+
+    # the keyword arguments of the four send/edit calls, built on first use
+    def _get_kwargs(self) -> tuple[dict[str, Any], ...]:
+        if self._kwargs is not None:
+            return self._kwargs
+        args_messageable_send: dict[str, Any] = {
+            "tts": self.tts,
+            "suppress_embeds": self.suppress_embeds,
+            "silent": self.silent,
         }
-        self.args_messageable_edit: dict[str, Any] = {
-            "suppress": suppress_embeds,
+        args_messageable_edit: dict[str, Any] = {
+            "suppress": self.suppress_embeds,
         }
-        self.args_interaction_send: dict[str, Any] = {
-            "tts": tts,
-            "ephemeral": ephemeral,
-            "suppress_embeds": suppress_embeds,
-            "silent": silent,
+        args_interaction_send: dict[str, Any] = {
+            "tts": self.tts,
+            "ephemeral": self.ephemeral,
+            "suppress_embeds": self.suppress_embeds,
+            "silent": self.silent,
         }
-        self.args_interaction_edit: dict[str, Any] = {}
-        if content is not None:
-            self.args_messageable_send["content"] = content
-            self.args_messageable_edit["content"] = content
-            self.args_interaction_send["content"] = content
-            self.args_interaction_edit["content"] = content
-        if embed is not None:
-            self.args_messageable_send["embed"] = embed
-            self.args_messageable_edit["embed"] = embed
-            self.args_interaction_send["embed"] = embed
-            self.args_interaction_edit["embed"] = embed
-        if embeds is not None:
-            self.args_messageable_send["embeds"] = embeds
-            self.args_messageable_edit["embeds"] = embeds
-            self.args_interaction_send["embeds"] = embeds
-            self.args_interaction_edit["embeds"] = embeds
-        if file is not None:
-            self.args_messageable_send["file"] = file
-            self.args_messageable_edit["attachments"] = [file]
-            self.args_interaction_send["file"] = file
-            self.args_interaction_edit["attachments"] = [file]
-        if files is not None:
-            self.args_messageable_send["files"] = files
-            self.args_messageable_edit["attachments"] = files
-            self.args_interaction_send["files"] = files
-            self.args_interaction_edit["attachments"] = files
-        if stickers is not None:
-            self.args_messageable_send["stickers"] = stickers
-        if delete_after is not None:
-            self.args_messageable_send["delete_after"] = delete_after
-            self.args_messageable_edit["delete_after"] = delete_after
-            self.args_interaction_send["delete_after"]
-            self.args_interaction_edit["delete_after"] = delete_after
-        if nonce is not None:
-            self.args_messageable_send["nonce"] = nonce
-        if allowed_mentions is not None:
-            self.args_messageable_send["allowed_mentions"] = allowed_mentions
-            self.args_messageable_edit["allowed_mentions"] = allowed_mentions
-            self.args_interaction_send["allowed_mentions"] = allowed_mentions
-            self.args_interaction_edit["allowed_mentions"] = allowed_mentions
-        if reference is not None:
-            self.args_messageable_send["reference"] = reference
-        if mention_author is not None:
-            self.args_messageable_send["mention_author"] = mention_author
-        if view is not None:
-            self.args_messageable_send["view"] = view
-            self.args_messageable_edit["view"] = view
-            self.args_interaction_send["view"] = view
-            self.args_interaction_edit["view"] = view
+        args_interaction_edit: dict[str, Any] = {}
+        if self.content is not None:
+            args_messageable_send["content"] = self.content
+            args_messageable_edit["content"] = self.content
+            args_interaction_send["content"] = self.content
+            args_interaction_edit["content"] = self.content
+        if self.embed is not None:
+            args_messageable_send["embed"] = self.embed
+            args_messageable_edit["embed"] = self.embed
+            args_interaction_send["embed"] = self.embed
+            args_interaction_edit["embed"] = self.embed
+        if self.embeds is not None:
+            args_messageable_send["embeds"] = self.embeds
+            args_messageable_edit["embeds"] = self.embeds
+            args_interaction_send["embeds"] = self.embeds
+            args_interaction_edit["embeds"] = self.embeds
+        if self.file is not None:
+            args_messageable_send["file"] = self.file
+            args_messageable_edit["attachments"] = [self.file]
+            args_interaction_send["file"] = self.file
+            args_interaction_edit["attachments"] = [self.file]
+        if self.files is not None:
+            args_messageable_send["files"] = self.files
+            args_messageable_edit["attachments"] = self.files
+            args_interaction_send["files"] = self.files
+            args_interaction_edit["attachments"] = self.files
+        if self.stickers is not None:
+            args_messageable_send["stickers"] = self.stickers
+        if self.delete_after is not None:
+            args_messageable_send["delete_after"] = self.delete_after
+            args_messageable_edit["delete_after"] = self.delete_after
+            args_interaction_send["delete_after"] = self.delete_after
+            args_interaction_edit["delete_after"] = self.delete_after
+        if self.nonce is not None:
+            args_messageable_send["nonce"] = self.nonce
+        if self.allowed_mentions is not None:
+            args_messageable_send["allowed_mentions"] = self.allowed_mentions
+            args_messageable_edit["allowed_mentions"] = self.allowed_mentions
+            args_interaction_send["allowed_mentions"] = self.allowed_mentions
+            args_interaction_edit["allowed_mentions"] = self.allowed_mentions
+        if self.reference is not None:
+            args_messageable_send["reference"] = self.reference
+        if self.mention_author is not None:
+            args_messageable_send["mention_author"] = self.mention_author
+        if self.view is not None:
+            args_messageable_send["view"] = self.view
+            args_messageable_edit["view"] = self.view
+            args_interaction_send["view"] = self.view
+            args_interaction_edit["view"] = self.view
+        kwargs = (
+            args_messageable_send,
+            args_messageable_edit,
+            args_interaction_send,
+            args_interaction_edit,
+        )
+        object.__setattr__(self, "_kwargs", kwargs)
+        return kwargs
+
+    @property
+    def args_messageable_send(self) -> dict[str, Any]:
+        return self._get_kwargs()[0]
+
+    @property
+    def args_messageable_edit(self) -> dict[str, Any]:
+        return self._get_kwargs()[1]
+
+    @property
+    def args_interaction_send(self) -> dict[str, Any]:
+        return self._get_kwargs()[2]
+
+    @property
+    def args_interaction_edit(self) -> dict[str, Any]:
+        return self._get_kwargs()[3]
 
     def copy(
         self,
@@ -143,8 +229,8 @@ class Window(IWindow):
         tts: Union[bool, UnSetType] = UnSet,
         embed: Union[discord.Embed, UnSetType] = UnSet,
         embeds: Union[list[discord.Embed], UnSetType] = UnSet,
-        file: Union[discord.File, UnSetType] = UnSet,
-        files: Union[list[discord.File], UnSetType] = UnSet,
+        file: Union[discord.File, StoredAttachment, UnSetType] = UnSet,
+        files: Union[list[Union[discord.File, StoredAttachment]], UnSetType] = UnSet,
         stickers: Union[
             Sequence[Union[discord.GuildSticker, discord.StickerItem]], UnSetType
         ] = UnSet,
@@ -164,65 +250,272 @@ class Window(IWindow):
             UnSetType,
         ] = UnSet,
     ) -> "Window":
-        return Window(
-            content=self.content if content is UnSet else content,
-            tts=self.tts if tts is UnSet else tts,
-            embed=self.embed if embed is UnSet else embed,
-            embeds=self.embeds if embeds is UnSet else embeds,
-            file=self.file if file is UnSet else file,
-            files=self.files if files is UnSet else files,
-            stickers=self.stickers if stickers is UnSet else stickers,
-            delete_after=self.delete_after if delete_after is UnSet else delete_after,
-            nonce=self.nonce if nonce is UnSet else nonce,
-            allowed_mentions=self.allowed_mentions
-            if allowed_mentions is UnSet
-            else allowed_mentions,
-            reference=self.reference if reference is UnSet else reference,
-            mention_author=self.mention_author
-            if mention_author is UnSet
-            else mention_author,
-            view=self.view if view is UnSet else view,
-            suppress_embeds=self.suppress_embeds
-            if suppress_embeds is UnSet
-            else suppress_embeds,
-            silent=self.silent if silent is UnSet else silent,
-            ephemeral=self.ephemeral if ephemeral is UnSet else ephemeral,
-            emojis=self.emojis if emojis is UnSet else emojis,
+        changes = {
+            name: value
+            for name, value in (
+                ("content", content),
+                ("tts", tts),
+                ("embed", embed),
+                ("embeds", embeds),
+                ("file", file),
+                ("files", files),
+                ("stickers", stickers),
+                ("delete_after", delete_after),
+                ("nonce", nonce),
+                ("allowed_mentions", allowed_mentions),
+                ("reference", reference),
+                ("mention_author", mention_author),
+                ("view", view),
+                ("suppress_embeds", suppress_embeds),
+                ("silent", silent),
+                ("ephemeral", ephemeral),
+                ("emojis", emojis),
+            )
+            if value is not UnSet
+        }
+        # unchanged fields and, if possible, the built kwargs are shared with self
+        window = object.__new__(type(self))
+        for name in Window.FIELDS:
+            object.__setattr__(window, name, changes.get(name, getattr(self, name)))
+        object.__setattr__(
+            window,
+            "_kwargs",
+            self._kwargs if changes.keys() <= Window.KWARGS_FREE_FIELDS else None,
         )
+        return window
 
-    async def send(self, sender: discord.abc.Messageable) -> discord.Message:
-        message: discord.Message = await sender.send(**self.args_messageable_send)
-        if self.emojis is not None:
-            for emoji in self.emojis:
-                await message.add_reaction(emoji=emoji)
+    # stored attachments become fresh discord.File objects on every send, or their
+    # CDN URL if it may be reused; uploaded collects what is uploaded, in order
+    def _fresh(
+        self, kwargs: dict[str, Any], uploaded: Optional[list[Any]] = None
+    ) -> dict[str, Any]:
+        if uploaded is not None:
+            # a retried send starts over
+            uploaded.clear()
+        if not any(isinstance(file, StoredAttachment) for file in self._files()):
+            return kwargs
+        urls: list[str] = []
+
+        def convert(file: Any) -> Any:
+            if not isinstance(file, StoredAttachment):
+                if uploaded is not None:
+                    uploaded.append(file)
+                return file
+            url = file.reusable_url()
+            if url is None:
+                if uploaded is not None:
+                    uploaded.append(file)
+                return file.to_file()
+            urls.append(url)
+            return None
+
+        kwargs = dict(kwargs)
+        if "file" in kwargs:
+            file = convert(kwargs.pop("file"))
+            if file is not None:
+                kwargs["file"] = file
+        for name in ("files", "attachments"):
+            if name in kwargs:
+                kwargs[name] = [
+                    file for file in map(convert, kwargs[name]) if file is not None
+                ]
+        if urls:
+            kwargs["content"] = "\n".join(
+                ([kwargs["content"]] if kwargs.get("content") else []) + urls
+            )
+        return kwargs
+
+    # the message's attachments are in upload order; discord rewrites some file
+    # names, so they cannot be matched by name
+    def _remember_uploads(
+        self,
+        message: Optional[discord.Message],
+        uploaded: list[Any],
+        replaced: bool = False,
+    ) -> None:
+        if not isinstance(message, discord.Message):
+            return
+        # an edit with attachments removed the ones the message had
+        if replaced:
+            forget_message(message.id)
+        # a message that deletes itself is no place to link to
+        if self.delete_after is not None:
+            return
+        for file, attachment in zip(uploaded, message.attachments):
+            if isinstance(file, StoredAttachment):
+                file.remember(attachment, message.id)
+
+    # reactions are added in the background so the caller gets the message right away
+    def _add_reactions(
+        self, target: MessageTarget, skip_existing: bool = False
+    ) -> Optional[asyncio.Task]:
+        if not self.emojis:
+            return None
+        return reaction_pipeline.add(target, self.emojis, skip_existing=skip_existing)
+
+    # with an outbound scheduler the send waits for its turn in the channel's queue
+    @metrics.timed("window_seconds", operation="send")
+    async def send(
+        self,
+        sender: discord.abc.Messageable,
+        outbound: Optional[OutboundScheduler] = None,
+        priority: Priority = Priority.BACKGROUND,
+    ) -> discord.Message:
+        uploaded: list[Any] = []
+        if outbound is None:
+            message: discord.Message = await sender.send(
+                **self._fresh(self.args_messageable_send, uploaded)
+            )
+        else:
+            message = await outbound.submit(
+                channel_id(sender),
+                lambda: sender.send(
+                    **self._fresh(self.args_messageable_send, uploaded)
+                ),
+                priority=priority,
+            )
+        self._remember_uploads(message, uploaded)
+        self._add_reactions(message)
         return message
 
-    async def reply(self, message: discord.Message) -> discord.Message:
-        new_message: discord.Message = await message.reply(**self.args_messageable_send)
-        if self.emojis is not None:
-            for emoji in self.emojis:
-                await new_message.add_reaction(emoji=emoji)
+    def _embeds(self) -> list[discord.Embed]:
+        return ([] if self.embed is None else [self.embed]) + (self.embeds or [])
+
+    def _files(self) -> list[Union[discord.File, StoredAttachment]]:
+        return ([] if self.file is None else [self.file]) + (self.files or [])
+
+    # windows can share a message only if everything but content, embeds and files
+    # is the same; views, stickers and nonces always get a message of their own
+    def _merge_key(self) -> Optional[tuple]:
+        if self.view is not None or self.stickers is not None or self.nonce is not None:
+            return None
+        return (
+            self.tts,
+            self.delete_after,
+            self.allowed_mentions,
+            self.reference,
+            self.mention_author,
+            self.suppress_embeds,
+            self.silent,
+            self.ephemeral,
+            None if self.emojis is None else tuple(self.emojis),
+        )
+
+    @staticmethod
+    def _can_merge(group: list["Window"], window: "Window") -> bool:
+        key = window._merge_key()
+        if key is None or group[0]._merge_key() != key:
+            return False
+        windows = group + [window]
+        contents = [w.content for w in windows if w.content is not None]
+        embeds = [embed for w in windows for embed in w._embeds()]
+        return (
+            sum(len(content) for content in contents) + len(contents) - 1
+            <= MAX_CONTENT_LENGTH
+            and len(embeds) <= MAX_EMBEDS
+            and sum(len(embed) for embed in embeds) <= MAX_EMBEDS_LENGTH
+            and sum(len(w._files()) for w in windows) <= MAX_FILES
+        )
+
+    @staticmethod
+    def _merge(group: list["Window"]) -> "Window":
+        contents = [w.content for w in group if w.content is not None]
+        embeds = [embed for w in group for embed in w._embeds()]
+        files = [file for w in group for file in w._files()]
+        return group[0].copy(
+            content="\n".join(contents) if contents else None,
+            embed=None,
+            embeds=embeds if embeds else None,
+            file=None,
+            files=files if files else None,
+        )
+
+    # sends the windows in order, packing neighbours into as few messages as the
+    # limits allow; the i-th message returned holds the i-th window
+    @staticmethod
+    @metrics.timed("window_seconds", operation="send_many")
+    async def send_many(
+        sender: discord.abc.Messageable,
+        windows: Sequence["Window"],
+        outbound: Optional[OutboundScheduler] = None,
+        priority: Priority = Priority.BACKGROUND,
+    ) -> list[discord.Message]:
+        groups: list[list[Window]] = []
+        for window in windows:
+            if groups and Window._can_merge(groups[-1], window):
+                groups[-1].append(window)
+            else:
+                groups.append([window])
+        messages: list[discord.Message] = []
+        for group in groups:
+            window = group[0] if len(group) == 1 else Window._merge(group)
+            message = await window.send(sender, outbound=outbound, priority=priority)
+            messages.extend([message] * len(group))
+        return messages
+
+    @metrics.timed("window_seconds", operation="reply")
+    async def reply(
+        self,
+        message: discord.Message,
+        outbound: Optional[OutboundScheduler] = None,
+        priority: Priority = Priority.BACKGROUND,
+    ) -> discord.Message:
+        uploaded: list[Any] = []
+        if outbound is None:
+            new_message: discord.Message = await message.reply(
+                **self._fresh(self.args_messageable_send, uploaded)
+            )
+        else:
+            new_message = await outbound.submit(
+                channel_id(message),
+                lambda: message.reply(
+                    **self._fresh(self.args_messageable_send, uploaded)
+                ),
+                priority=priority,
+            )
+        self._remember_uploads(new_message, uploaded)
+        self._add_reactions(new_message)
         return new_message
 
+    @metrics.timed("window_seconds", operation="response_send")
     async def response_send(self, interaction: discord.Interaction) -> discord.Message:
-        message = await interaction.response.send_message(**self.args_interaction_send)
-        if self.emojis is not None:
-            for emoji in self.emojis:
-                await message.add_reaction(emoji=emoji)
+        message = await interaction.response.send_message(
+            **self._fresh(self.args_interaction_send)
+        )
+        self._add_reactions(interaction.original_response)
         return message
 
+    @metrics.timed("window_seconds", operation="edit")
     async def edit(self, message: discord.Message) -> discord.Message:
-        message: discord.Message = await message.edit(**self.args_messageable_edit)
-        if self.emojis is not None:
-            for emoji in self.emojis:
-                await message.add_reaction(emoji=emoji)
+        uploaded: list[Any] = []
+        kwargs = self._fresh(self.args_messageable_edit, uploaded)
+        message: discord.Message = await message.edit(**kwargs)
+        self._remember_uploads(message, uploaded, replaced="attachments" in kwargs)
+        self._add_reactions(message, skip_existing=True)
         return message
 
+    @metrics.timed("window_seconds", operation="response_edit")
     async def response_edit(self, interaction: discord.Interaction) -> discord.Message:
-        message: discord.Message = await interaction.response.edit_message(
-            **self.args_interaction_edit
-        )
-        if self.emojis is not None:
-            for emoji in self.emojis:
-                await message.add_reaction(emoji=emoji)
-        return message
\ No newline at end of file
+        kwargs = self._fresh(self.args_interaction_edit)
+        message: discord.Message = await interaction.response.edit_message(**kwargs)
+        if "attachments" in kwargs and interaction.message is not None:
+            forget_message(interaction.message.id)
+        self._add_reactions(interaction.original_response, skip_existing=True)
+        return message
+
+    # edits the message of an interaction that has already been responded to,
+    # e.g. deferred
+    @metrics.timed("window_seconds", operation="edit_original")
+    async def edit_original(self, interaction: discord.Interaction) -> discord.Message:
+        uploaded: list[Any] = []
+        kwargs = self._fresh(self.args_interaction_edit, uploaded)
+        if "delete_after" in kwargs:
+            kwargs = {
+                name: value for name, value in kwargs.items() if name != "delete_after"
+            }
+        message = await interaction.edit_original_response(**kwargs)
+        if self.delete_after is not None:
+            await message.delete(delay=self.delete_after)
+        self._remember_uploads(message, uploaded, replaced="attachments" in kwargs)
+        self._add_reactions(message, skip_existing=True)
+        return message
@@ -1,17 +1,207 @@
-from .window import Window
+import abc
+import asyncio
+import inspect
+import io
+import tempfile
+from typing import (
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Iterator,
+    Optional,
+    Union,
+)
+
+from .metrics import metrics
+from .profiling import current_session, followed
+from .teardown import teardown_service
+from .window import MAX_CONTENT_LENGTH, Window
 import discord
 
+
+metrics.describe("pages_seconds", "Time spent showing or navigating a paginator.")
+
+
+class PageSource(metaclass=abc.ABCMeta):
+    @abc.abstractmethod
+    async def get(self, index: int) -> Window:
+        raise NotImplementedError
+
+    # None while the number of pages is not known yet
+    @abc.abstractmethod
+    def length(self) -> Optional[int]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class ListPageSource(PageSource):
+    def __init__(self, windows: list[Window]) -> None:
+        self.windows = windows
+
+    async def get(self, index: int) -> Window:
+        if index < 0:
+            raise IndexError
+        return self.windows[index]
+
+    def length(self) -> Optional[int]:
+        return len(self.windows)
+
+
+# renders a page with a sync or async callable
+class CallablePageSource(PageSource):
+    def __init__(
+        self,
+        render: Callable[[int], Union[Window, Awaitable[Window]]],
+        length: int,
+    ) -> None:
+        self.render = render
+        self._length = length
+
+    async def get(self, index: int) -> Window:
+        if index < 0 or self._length <= index:
+            raise IndexError
+        window = self.render(index)
+        if inspect.isawaitable(window):
+            window = await window
+        return window
+
+    def length(self) -> Optional[int]:
+        return self._length
+
+
+# pulls pages from an async iterator as far as they are requested, and one more, so
+# that the length is known by the time the last page is shown
+class IteratorPageSource(PageSource):
+    def __init__(self, iterator: AsyncIterator[Window]) -> None:
+        self.iterator = iterator
+        self.windows: list[Window] = []
+        self.exhausted = False
+        self.lock = asyncio.Lock()
+
+    async def get(self, index: int) -> Window:
+        if index < 0:
+            raise IndexError
+        async with self.lock:
+            while len(self.windows) <= index + 1 and not self.exhausted:
+                try:
+                    self.windows.append(await anext(self.iterator))
+                except StopAsyncIteration:
+                    self.exhausted = True
+            if len(self.windows) <= index:
+                raise IndexError
+        return self.windows[index]
+
+    def length(self) -> Optional[int]:
+        return len(self.windows) if self.exhausted else None
+
+
+# pages of text cut on line boundaries as the reader moves forward; finished pages
+# are spooled to a temporary file and only their offsets are kept in memory
+class TextPageSource(PageSource):
+    def __init__(
+        self,
+        lines: Union[str, Iterable[str], AsyncIterable[str]],
+        render: Optional[Callable[[str], Window]] = None,
+        limit: int = MAX_CONTENT_LENGTH,
+    ) -> None:
+        if limit <= 0:
+            raise ValueError
+        # a whole text is split into lines rather than iterated character by character
+        if isinstance(lines, str):
+            lines = io.StringIO(lines)
+        elif isinstance(lines, (bytes, bytearray)):
+            raise TypeError("decode the text first")
+        self.lines: Union[Iterator[str], AsyncIterator[str]] = (
+            aiter(lines) if hasattr(lines, "__aiter__") else iter(lines)
+        )
+        self.render = render if render is not None else TextPageSource._render
+        self.limit = limit
+        self.spool = tempfile.TemporaryFile()
+        # page i is spool[offsets[i]:offsets[i + 1]]
+        self.offsets: list[int] = [0]
+        self.carry: Optional[str] = None
+        self.exhausted = False
+        self.lock = asyncio.Lock()
+
+    # discord rejects empty messages
+    @staticmethod
+    def _render(text: str) -> Window:
+        return Window(content=text if text else "(空)")
+
+    async def _next_line(self) -> Optional[str]:
+        if self.carry is not None:
+            line, self.carry = self.carry, None
+            return line
+        try:
+            if isinstance(self.lines, AsyncIterator):
+                line = await anext(self.lines)
+            else:
+                line = next(self.lines)
+        except (StopIteration, StopAsyncIteration):
+            return None
+        return line.rstrip("\r\n")
+
+    async def _read_page(self) -> None:
+        page: list[str] = []
+        size = -1
+        while True:
+            line = await self._next_line()
+            if line is None:
+                self.exhausted = True
+                break
+            # a line that does not fit on a page of its own is cut
+            if len(line) > self.limit:
+                line, self.carry = line[: self.limit], line[self.limit :]
+            if size + 1 + len(line) > self.limit:
+                self.carry = line if self.carry is None else line + self.carry
+                break
+            page.append(line)
+            size += 1 + len(line)
+        # an empty text still gets one, empty, page
+        if not page and len(self.offsets) > 1:
+            return
+        self.spool.seek(self.offsets[-1])
+        self.spool.write("\n".join(page).encode("utf-8"))
+        self.offsets.append(self.spool.tell())
+
+    async def get(self, index: int) -> Window:
+        if index < 0:
+            raise IndexError
+        async with self.lock:
+            # one page ahead, as with IteratorPageSource
+            while len(self.offsets) - 1 <= index + 1 and not self.exhausted:
+                await self._read_page()
+            if len(self.offsets) - 1 <= index:
+                raise IndexError
+            self.spool.seek(self.offsets[index])
+            text = self.spool.read(self.offsets[index + 1] - self.offsets[index])
+        return self.render(text.decode("utf-8"))
+
+    def length(self) -> Optional[int]:
+        return len(self.offsets) - 1 if self.exhausted else None
+
+    def close(self) -> None:
+        self.spool.close()
+
+
 class Windows:
     def __init__(self, defaultWindow: Window) -> None:
         self.defautlWindow = defaultWindow
         self.message: discord.Message = None
 
     async def run(self, interaction: discord.Interaction):
-        self.message = await self.defautlWindow.response_send(interaction=interaction)
+        await self.defautlWindow.response_send(interaction=interaction)
+        # response_send returns the callback response, not the message
+        self.message = await interaction.original_response()
 
     async def destroy(self):
         if self.message is not None:
-            await self.message.destroy()
+            await teardown_service.delete(self.message)
+            self.message = None
 
 
 class Pages(Windows):
@@ -32,6 +222,9 @@ class Pages(Windows):
             super().__init__(label=">>", disabled=disabled)
             self.pages = pages
 
+        def sync(self, index: int, length: Optional[int]) -> None:
+            self.disabled = length is not None and length - 1 <= index
+
         async def callback(self, interaction: discord.Interaction) -> None:
             await self.pages.move_to_side(next=True, interaction=interaction)
 
@@ -40,63 +233,221 @@ class Pages(Windows):
             super().__init__(label="<<", disabled=disabled)
             self.pages = pages
 
+        def sync(self, index: int, length: Optional[int]) -> None:
+            self.disabled = index <= 0
+
         async def callback(self, interaction: discord.Interaction) -> None:
             await self.pages.move_to_side(next=False, interaction=interaction)
 
     class PageButton(discord.ui.Button):
-        def __init__(self, pages: "Pages", index: int):
-            super().__init__(label="{0}/{1}".format(index, pages.length()))
+        def __init__(self, pages: "Pages", index: int = 1):
+            super().__init__()
             self.pages = pages
+            self.sync(index=index - 1, length=pages.length())
+
+        def sync(self, index: int, length: Optional[int]) -> None:
+            self.label = "{0}/{1}".format(index + 1, "?" if length is None else length)
 
         async def callback(self, interaction: discord.Interaction) -> None:
             await interaction.response.send_modal(
                 Pages.PageNumberModal(pages=self.pages)
             )
 
-    def __init__(self, windows: list[Window], defaultIndex: int = 0) -> None:
-        if len(windows) <= 0:
+    def __init__(
+        self,
+        windows: Union[list[Window], PageSource],
+        defaultIndex: int = 0,
+        cache_size: int = 5,
+        coalesce: bool = False,
+    ) -> None:
+        self.source = (
+            windows if isinstance(windows, PageSource) else ListPageSource(windows)
+        )
+        length = self.source.length()
+        if (length is not None and length <= 0) or cache_size <= 0:
             raise ValueError
         self.index = defaultIndex
-        self.windows = windows
-        for index in range(self.length()):
-            if self.windows[index].view is None:
-                self.windows[index] = self.windows[index].copy(view=discord.ui.View())
-            window = self.windows[index]
-            if len(window.view.children) >= 23:
-                raise ValueError
-            window.view.add_item(Pages.PrevButton(pages=self, disabled=index <= 0))
-            window.view.add_item(Pages.PageButton(pages=self, index=index + 1))
-            window.view.add_item(
-                Pages.NextButton(pages=self, disabled=self.length() - 1 <= index)
-            )
-        super().__init__(defaultWindow=windows[defaultIndex])
+        self.cache_size = cache_size
+        self.coalesce = coalesce
+        # guards index against concurrent button callbacks on the message
+        self.lock = asyncio.Lock()
+        self.target: Optional[int] = None
+        self.pending_interaction: Optional[discord.Interaction] = None
+        # rendered pages near the current index
+        self.rendered: dict[int, Window] = {}
+        self.rendering: dict[int, asyncio.Task] = {}
+        self.prefetching: set[asyncio.Task] = set()
+        # navigation is profiled too when a profiled command created the paginator
+        self.profile_session = current_session()
+        self.navigation = discord.ui.View()
+        self.navigation.add_item(Pages.PrevButton(pages=self))
+        self.navigation.add_item(Pages.PageButton(pages=self))
+        self.navigation.add_item(Pages.NextButton(pages=self))
+        super().__init__(defaultWindow=None)
 
-    def length(self):
-        return len(self.windows)
+    # pages through a text, a text stream or (async) iterable of lines; only a text
+    # is held in memory whole
+    @classmethod
+    def from_text(
+        cls,
+        lines: Union[str, Iterable[str], AsyncIterable[str]],
+        render: Optional[Callable[[str], Window]] = None,
+        limit: int = MAX_CONTENT_LENGTH,
+        **kwargs,
+    ) -> "Pages":
+        return cls(TextPageSource(lines, render=render, limit=limit), **kwargs)
+
+    async def destroy(self):
+        await super().destroy()
+        self.source.close()
+
+    def length(self) -> Optional[int]:
+        return self.source.length()
 
+    # pages without a view of their own share self.navigation; pages with one get
+    # the buttons added to it once
+    def _decorate(self, window: Window) -> Window:
+        if window.view is None:
+            return window.copy(view=self.navigation)
+        if window.view is self.navigation or any(
+            isinstance(item, Pages.PrevButton) and item.pages is self
+            for item in window.view.children
+        ):
+            return window
+        if len(window.view.children) >= 23:
+            raise ValueError
+        window.view.add_item(Pages.PrevButton(pages=self))
+        window.view.add_item(Pages.PageButton(pages=self))
+        window.view.add_item(Pages.NextButton(pages=self))
+        return window
+
+    # button labels and disabled states are set from the index right before sending
+    def _sync_navigation(self, window: Window, index: int) -> None:
+        length = self.length()
+        for item in window.view.children:
+            if (
+                isinstance(item, (Pages.PrevButton, Pages.PageButton, Pages.NextButton))
+                and item.pages is self
+            ):
+                item.sync(index=index, length=length)
+
+    async def _render(self, index: int) -> Window:
+        window = self._decorate(await self.source.get(index))
+        self.rendered[index] = window
+        while len(self.rendered) > self.cache_size:
+            del self.rendered[max(self.rendered, key=lambda i: abs(i - self.index))]
+        return window
+
+    async def get_window(self, index: int) -> Window:
+        window = self.rendered.get(index)
+        if window is not None:
+            return window
+        task = self.rendering.get(index)
+        if task is None:
+            task = asyncio.create_task(self._render(index))
+            self.rendering[index] = task
+            task.add_done_callback(lambda _: self.rendering.pop(index, None))
+        return await task
+
+    # the page at index or, if index turns out to be past either end, the current page
+    # again; by then the length is known and the buttons get synced to it
+    async def _window_or_current(self, index: int) -> tuple[int, Window]:
+        if index >= 0:
+            try:
+                return index, await self.get_window(index)
+            except IndexError:
+                pass
+        return self.index, await self.get_window(self.index)
+
+    async def _prefetch_one(self, index: int) -> None:
+        try:
+            await self.get_window(index)
+        except IndexError:
+            pass
+
+    # renders the neighbours of the current page in the background
+    def _prefetch(self) -> None:
+        length = self.length()
+        for index in (self.index + 1, self.index - 1):
+            if index < 0 or (length is not None and length <= index):
+                continue
+            if index in self.rendered or index in self.rendering:
+                continue
+            task = asyncio.create_task(self._prefetch_one(index))
+            self.prefetching.add(task)
+            task.add_done_callback(self.prefetching.discard)
+
+    @metrics.timed("pages_seconds", operation="run")
+    @followed
+    async def run(self, interaction: discord.Interaction):
+        try:
+            window = await self.get_window(self.index)
+        except IndexError:
+            # a lazy source can turn out to be empty, as a list is rejected up front
+            if self.length() == 0:
+                raise ValueError("no pages") from None
+            raise
+        self._sync_navigation(window, self.index)
+        await window.response_send(interaction=interaction)
+        self.message = await interaction.original_response()
+        self._prefetch()
+
+    # acknowledges the click at once and folds clicks that arrive while an edit is
+    # in flight into one edit to the latest target
+    async def _queue_move(
+        self, move: Callable[[int], int], interaction: discord.Interaction
+    ) -> None:
+        await interaction.response.defer()
+        target = move(self.index if self.target is None else self.target)
+        length = self.length()
+        if target < 0 or (length is not None and length <= target):
+            return
+        self.target = target
+        self.pending_interaction = interaction
+        if self.lock.locked():
+            return
+        async with self.lock:
+            try:
+                while self.target is not None and self.target != self.index:
+                    target = self.target
+                    index, window = await self._window_or_current(target)
+                    # past the end; stays here unless another click came meanwhile
+                    if index != target and self.target == target:
+                        self.target = index
+                    self._sync_navigation(window, index)
+                    await window.edit_original(interaction=self.pending_interaction)
+                    self.index = index
+                    self._prefetch()
+            finally:
+                self.target = None
+                self.pending_interaction = None
+
+    @metrics.timed("pages_seconds", operation="move_on_page_number")
+    @followed
     async def move_on_page_number(
         self, page_number: int, interaction: discord.Interaction
     ):
         page_number -= 1
-        if page_number < 0 or self.length() <= page_number:
-            raise IndexError
-        self.index = page_number
-        await self.windows[page_number].response_edit(interaction=interaction)
+        if self.coalesce:
+            await self._queue_move(lambda _: page_number, interaction)
+            return
+        async with self.lock:
+            page_number, window = await self._window_or_current(page_number)
+            self._sync_navigation(window, page_number)
+            self.index = page_number
+            await window.response_edit(interaction=interaction)
+            self._prefetch()
 
+    @metrics.timed("pages_seconds", operation="move_to_side")
+    @followed
     async def move_to_side(self, next: bool, interaction: discord.Interaction):
-        if next:
-            if self.index + 1 < self.length():
-                await self.windows[self.index + 1].response_edit(
-                    interaction=interaction
-                )
-                self.index += 1
-            else:
-                raise IndexError
-        else:
-            if 0 <= self.index - 1:
-                await self.windows[self.index - 1].response_edit(
-                    interaction=interaction
-                )
-                self.index -= 1
-            else:
-                raise IndexError
\ No newline at end of file
+        step = 1 if next else -1
+        if self.coalesce:
+            await self._queue_move(lambda index: index + step, interaction)
+            return
+        async with self.lock:
+            index, window = await self._window_or_current(self.index + step)
+            self._sync_navigation(window, index)
+            await window.response_edit(interaction=interaction)
+            self.index = index
+            self._prefetch()